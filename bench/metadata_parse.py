@@ -0,0 +1,231 @@
+"""Benchmark the streaming MusicParameterTable parser against the previous
+json.load + if/elif parser.
+
+Run from the project root:
+    python bench/metadata_parse.py [--source data/metadata.json] [--scale 10]
+
+Without --source, songs are synthesized in the same shape as a UAssetAPI export.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data import music_table  # noqa: E402
+
+_PROPERTY_TYPE = "UAssetAPI.PropertyTypes.Objects.{}PropertyData, UAssetAPI"
+
+
+def _prop(name: str, value, kind: str = "Str") -> dict:
+    return {
+        "$type": _PROPERTY_TYPE.format(kind),
+        "Name": name,
+        "ArrayIndex": 0,
+        "IsZero": False,
+        "PropertyTagFlags": "None",
+        "PropertyTypeName": None,
+        "DuplicationIndex": 0,
+        "Value": value,
+    }
+
+
+def synthetic_row(n: int) -> dict:
+    s, num = divmod(n, 1000)
+    id = f"S{s:02d}-{num:03d}"
+    props = [
+        _prop("AssetDirectory", id),
+        _prop("ScoreGenre", str(n % 8), "Int"),
+        _prop("MusicMessage", f"Song Title {n}"),
+        _prop("ArtistMessage", f"Artist {n % 97}"),
+        _prop("Rubi", f"そんぐたいとる{n}"),
+        _prop("Bpm", "120-180"),
+        _prop("CopyrightMessage", "-" if n % 2 else f"(C) Company {n}"),
+        _prop("VersionNo", 1 + n % 5, "Int"),
+        _prop("JacketAssetName", f"S{s:02d}/uT_J_{id}"),
+        _prop("PreviewBeginTime", "30.000000", "Float"),
+        _prop("PreviewSeconds", "10.000000", "Float"),
+    ]
+    for i, d in enumerate(("Normal", "Hard", "Extreme", "Inferno")):
+        props.append(_prop(f"Difficulty{d}Lv", f"{3 * i + 2}.700000", "Float"))
+        props.append(_prop(f"ClearNormaRate{d}", "0.800000", "Float"))
+    for d in ("Normal", "Hard", "Expert", "Inferno"):
+        props.append(_prop(f"NotesDesigner{d}", f"Designer {n % 11}"))
+    for d in ("", "Hard", "Expert", "Inferno"):
+        props.append(_prop(f"MovieAssetName{d}", "-"))
+    # properties the app doesn't use
+    for i in range(20):
+        props.append(_prop(f"Unused{i}", str(i), "Int"))
+    return {
+        "$type": "UAssetAPI.StructTypes.StructPropertyData",
+        "Name": id,
+        "Value": props,
+    }
+
+
+def make_metadata(path: str, scale: int, source: str = None):
+    """Write a metadata.json with `scale` times the songs of `source` (or 400 synthetic songs)."""
+    if source is not None:
+        with open(source, "r", encoding="utf_8") as f:
+            doc = json.load(f)
+        rows = doc["Exports"][0]["Table"]["Data"]
+    else:
+        doc = {
+            "Info": "Serialized with UAssetAPI",
+            "NameMap": [f"Name{i}" for i in range(2000)],
+            "Imports": [],
+            "Exports": [{"$type": "UAssetAPI.ExportTypes.DataTableExport"}],
+        }
+        rows = [synthetic_row(n) for n in range(1, 401)]
+
+    doc["Exports"][0]["Table"] = {"Data": rows * scale}
+    with open(path, "w", encoding="utf_8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+
+
+def legacy_parse(path: str) -> int:
+    """The parser init_songs used before music_table."""
+    with open(path, "r", encoding="utf_8") as read_file:
+        md_json = json.load(read_file)["Exports"][0]["Table"]["Data"]
+
+    count = 0
+    for elem in md_json:
+        levels = [None] * 4
+        level_designer = [None] * 4
+        level_clear_requirements = [None] * 4
+        background_video = [None] * 4
+        for key in elem["Value"]:
+            if key["Name"] == "AssetDirectory":
+                id = key["Value"]
+            elif key["Name"] == "ScoreGenre":
+                genre = int(key["Value"])
+            elif key["Name"] == "MusicMessage":
+                name = key["Value"]
+            elif key["Name"] == "ArtistMessage":
+                artist = key["Value"]
+            elif key["Name"] == "Rubi":
+                rubi = key["Value"]
+            elif key["Name"] == "Bpm":
+                tempo = key["Value"]
+            elif key["Name"] == "CopyrightMessage" and key["Value"] not in [
+                "",
+                "-",
+                None,
+            ]:
+                copyright = key["Value"]
+            elif key["Name"] == "VersionNo":
+                version = key["Value"]
+            elif key["Name"] == "JacketAssetName":
+                jacket_path = key["Value"]
+            elif key["Name"] == "DifficultyNormalLv":
+                levels[0] = round(float(key["Value"]), 2)
+            elif key["Name"] == "DifficultyHardLv":
+                levels[1] = round(float(key["Value"]), 2)
+            elif key["Name"] == "DifficultyExtremeLv":
+                levels[2] = round(float(key["Value"]), 2)
+            elif key["Name"] == "DifficultyInfernoLv":
+                levels[3] = round(float(key["Value"]), 2)
+            elif key["Name"] == "PreviewBeginTime":
+                audio_preview = round(float(key["Value"]), 2)
+            elif key["Name"] == "PreviewSeconds":
+                audio_preview_len = round(float(key["Value"]), 2)
+            elif key["Name"] == "ClearNormaRateNormal":
+                level_clear_requirements[0] = round(float(key["Value"]), 2)
+            elif key["Name"] == "ClearNormaRateHard":
+                level_clear_requirements[1] = round(float(key["Value"]), 2)
+            elif key["Name"] == "ClearNormaRateExtreme":
+                level_clear_requirements[2] = round(float(key["Value"]), 2)
+            elif key["Name"] == "ClearNormaRateInferno":
+                level_clear_requirements[3] = round(float(key["Value"]), 2)
+            elif key["Name"] == "NotesDesignerNormal":
+                level_designer[0] = key["Value"]
+            elif key["Name"] == "NotesDesignerHard":
+                level_designer[1] = key["Value"]
+            elif key["Name"] == "NotesDesignerExpert":
+                level_designer[2] = key["Value"]
+            elif key["Name"] == "NotesDesignerInferno":
+                level_designer[3] = key["Value"]
+            elif key["Name"] == "MovieAssetName" and key["Value"] not in [
+                "",
+                "-",
+                None,
+            ]:
+                background_video[0] = key["Value"]
+            elif key["Name"] == "MovieAssetNameHard" and key["Value"] not in [
+                "",
+                "-",
+                None,
+            ]:
+                background_video[1] = key["Value"]
+            elif key["Name"] == "MovieAssetNameExpert" and key["Value"] not in [
+                "",
+                "-",
+                None,
+            ]:
+                background_video[2] = key["Value"]
+            elif key["Name"] == "MovieAssetNameInferno" and key["Value"] not in [
+                "",
+                "-",
+                None,
+            ]:
+                background_video[3] = key["Value"]
+        count += 1
+    return count
+
+
+def streaming_parse(path: str) -> int:
+    count = 0
+    for _ in music_table.iter_songs(path):
+        count += 1
+    return count
+
+
+def measure(func, path: str, repeat: int) -> dict:
+    """Best wall time over `repeat` runs, and peak traced memory of one run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        songs = func(path)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"songs": songs, "seconds": min(times), "peak_mib": peak / (1 << 20)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", help="real metadata.json to replicate")
+    parser.add_argument("--scale", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "metadata.json")
+        make_metadata(path, args.scale, args.source)
+        print(
+            f"{os.path.getsize(path) / (1 << 20):.1f} MiB metadata.json ({args.scale}x)"
+        )
+
+        results = {
+            "legacy": measure(legacy_parse, path, args.repeat),
+            "streaming": measure(streaming_parse, path, args.repeat),
+        }
+
+    for name, r in results.items():
+        print(
+            f"{name:>10}: {r['songs']} songs in {r['seconds']:.3f}s,"
+            f" peak {r['peak_mib']:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
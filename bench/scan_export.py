@@ -0,0 +1,146 @@
+"""Time the data setup tasks and exporting on synthetic working folders.
+
+Run from the project root:
+    python bench/scan_export.py [--scales 1 5 20] [--report bench-report.json]
+
+Each scale gets a fresh working folder from synthetic.py. Metadata,
+audio and jackets are timed cold (no scan index or thumbnail atlas) and
+warm, then every song is exported as WAV, exported again (nothing left
+to do), and converted to MP3 with a stub ffmpeg that only copies its
+input, so the numbers measure the exporter rather than the encoder.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# resource_path looks here first; switched to each synthetic awb.csv below
+sys._MEIPASS = ROOT
+
+import config  # noqa: E402
+import data.database as database  # noqa: E402
+from cli import export_songs  # noqa: E402
+from data.task import ConsoleProgress  # noqa: E402
+from export import ExportOptions  # noqa: E402
+from synthetic import make_working_folder  # noqa: E402
+
+# jackets_progress_task imports it, which loads assets through resource_path
+import ui.tabs.listing_tab  # noqa: E402, F401
+
+FFMPEG_STUB = """import shutil, sys
+args = sys.argv[1:]
+src = args[args.index("-i") + 1]
+dest = [a for i, a in enumerate(args) if not a.startswith("-") and args[i - 1] not in
+        ("-i", "-b:a", "-threads", "-loglevel", "-f")][-1]
+shutil.copyfile(src, dest)
+"""
+
+
+class QuietProgress(ConsoleProgress):
+    def log(self, msg):
+        pass
+
+
+def install_ffmpeg_stub(dir: str):
+    """Put an `ffmpeg` that copies its input to its output first on PATH."""
+    script = os.path.join(dir, "ffmpeg_stub.py")
+    with open(script, "w") as f:
+        f.write(FFMPEG_STUB)
+    if os.name == "nt":
+        with open(os.path.join(dir, "ffmpeg.bat"), "w") as f:
+            f.write(f'@"{sys.executable}" "{script}" %*\n')
+    else:
+        wrapper = os.path.join(dir, "ffmpeg")
+        with open(wrapper, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+        os.chmod(wrapper, 0o755)
+    os.environ["PATH"] = dir + os.pathsep + os.environ["PATH"]
+
+
+def timed(results: dict, name: str, func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ret = func(*args)
+    results[name] = round(time.perf_counter() - start, 4)
+    return ret
+
+
+def bench_scale(root: str, scale: float, workers: int) -> dict:
+    start = time.perf_counter()
+    summary = make_working_folder(root, scale)
+    generated = time.perf_counter() - start
+
+    sys._MEIPASS = summary["app_path"]
+    config.working_path = summary["working_path"]
+    phases: dict[str, float] = dict()
+    for run in ("cold", "warm"):
+        timed(phases, f"metadata_{run}", database.init_songs, QuietProgress("m"))
+        timed(phases, f"audio_{run}", database.init_audio, QuietProgress("a"))
+        timed(
+            phases,
+            f"jackets_{run}",
+            database.jackets_progress_task,
+            QuietProgress("j"),
+        )
+
+    ids = list(database.metadata.keys())
+    wav = ExportOptions(output_path=os.path.join(root, "out-wav"), workers=workers)
+    mp3 = ExportOptions(
+        output_path=os.path.join(root, "out-mp3"), audio_target="mp3", workers=workers
+    )
+    failed = timed(phases, "export_wav", export_songs, ids, wav)
+    failed |= timed(phases, "export_wav_again", export_songs, ids, wav)
+    failed |= timed(phases, "export_mp3", export_songs, ids, mp3)
+
+    return {
+        "songs": summary["songs"],
+        "found": {
+            "songs": len(database.metadata),
+            "audio": len(database.audio_file),
+            "jackets": len(database.jacket_preview),
+        },
+        "export_errors": bool(failed),
+        "generate_seconds": round(generated, 2),
+        "seconds": phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--report", default="bench-report.json")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        install_ffmpeg_stub(tmp)
+        for scale in args.scales:
+            print(f"Scale {scale:g}x...")
+            result = bench_scale(os.path.join(tmp, f"{scale:g}x"), scale, args.workers)
+            report["scales"][f"{scale:g}"] = result
+            for name, seconds in result["seconds"].items():
+                print(f"  {name:>18}: {seconds:.3f}s")
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Build a synthetic working folder shaped like a real one.
+
+Run from the project root:
+    python bench/synthetic.py OUT_DIR [--scale 5]
+
+Scale 1 is about the size of the Reverse 3.07 library. Besides the
+working folder, OUT_DIR/app gets an assets/awb.csv matching the
+generated audio; point sys._MEIPASS at it so resource_path finds it.
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from metadata_parse import synthetic_row  # noqa: E402
+
+BASE_SONGS = 394
+"""Songs in assets/awb.csv."""
+
+CUES_PER_AWB = 200
+JACKET_SIZE = (512, 512)
+JACKET_VARIANTS = 16
+
+
+def song_number(n: int) -> int:
+    """Song number of the nth synthetic song, skipping S99 system songs."""
+    num = 1001 + n
+    return num if num // 1000 != 99 else num + 1000
+
+
+def _jackets() -> list[bytes]:
+    """A few differently colored PNG jackets; encoding one per song would
+    dominate generating big libraries, and they decode at the same cost."""
+    variants = []
+    for i in range(JACKET_VARIANTS):
+        gradient = Image.linear_gradient("L").resize(JACKET_SIZE)
+        img = Image.merge(
+            "RGB",
+            (gradient, gradient.rotate(90), Image.new("L", JACKET_SIZE, 16 * i)),
+        )
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        variants.append(buf.getvalue())
+    return variants
+
+
+def _chart(audio: str, notes: int) -> str:
+    header = (
+        "#MUSIC_SCORE_ID 0\n"
+        "#MUSIC_SCORE_VERSION 0\n"
+        "#GAME_VERSION\n"
+        f"#MUSIC_FILE_PATH MER_BGM_{audio}\n"
+        "#OFFSET 0.104\n"
+        "#MOVIE_OFFSET 0.0\n"
+        "#BODY\n"
+    )
+    body = "".join(
+        f"{m} {t * 40} 1 {t} {m % 60} {4 + t % 4}\n"
+        for m in range(notes // 4)
+        for t in range(4)
+    )
+    return header + body
+
+
+def _write(path: str, data: bytes | str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+
+def make_working_folder(
+    root: str,
+    scale: float = 1,
+    wav_bytes: int = 64 << 10,
+    video_bytes: int = 256 << 10,
+    notes: int = 800,
+) -> dict:
+    """Write a working folder with `scale` times the songs of the real
+    library to `root`/data and its awb.csv to `root`/app/assets.
+
+    Every song has four charts and a jacket, every third a video; audio
+    is in pairs of cues like ACE extracts it. Returns a summary."""
+    data = os.path.join(root, "data")
+    app = os.path.join(root, "app")
+
+    songs = max(1, round(BASE_SONGS * scale))
+    jackets = _jackets()
+    wav = b"RIFF" + bytes(max(0, wav_bytes - 4))
+    video = bytes(video_bytes)
+    rows = []
+    awb = ["songID,awb\n"]
+    for n in range(songs):
+        num = song_number(n)
+        row = synthetic_row(num)
+        id = row["Name"]
+        if n % 3 == 0:
+            for prop in row["Value"]:
+                if prop["Name"] == "MovieAssetName":
+                    prop["Value"] = f"MER_MOVIE_{id}"
+            _write(os.path.join(data, "movies", f"MER_MOVIE_{id}.mp4"), video)
+        rows.append(row)
+
+        # audio, and the awb.csv entry pointing at it
+        folder = f"{n // (CUES_PER_AWB // 2):02d}"
+        cue = 2 * (n % (CUES_PER_AWB // 2))
+        awb.append(f"{num},{folder}_{cue}\n")
+        for c in (cue, cue + 1):
+            _write(os.path.join(data, "MER_BGM", folder, f"{c}.wav"), wav)
+
+        for d in range(4):
+            _write(
+                os.path.join(data, "MusicData", id, f"{id}_0{d}.mer"),
+                _chart(id.replace("-", "_"), notes),
+            )
+
+        s = id.split("-")[0]
+        _write(
+            os.path.join(data, "jackets", s, f"uT_J_{id}.png"),
+            jackets[n % len(jackets)],
+        )
+
+    doc = {
+        "Info": "Serialized with UAssetAPI",
+        "NameMap": [f"Name{i}" for i in range(2000)],
+        "Imports": [],
+        "Exports": [
+            {
+                "$type": "UAssetAPI.ExportTypes.DataTableExport",
+                "Table": {"Data": rows},
+            }
+        ],
+    }
+    with open(os.path.join(data, "metadata.json"), "w", encoding="utf_8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+    _write(os.path.join(app, "assets", "awb.csv"), "".join(awb))
+    shutil.copy(os.path.join(os.path.dirname(__file__), "..", "version.txt"), app)
+
+    return {"songs": songs, "working_path": data, "app_path": app}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out")
+    parser.add_argument("--scale", type=float, default=1)
+    parser.add_argument("--wav-kib", type=int, default=64)
+    parser.add_argument("--video-kib", type=int, default=256)
+    args = parser.parse_args()
+
+    summary = make_working_folder(
+        args.out, args.scale, args.wav_kib << 10, args.video_kib << 10
+    )
+    print(f"{summary['songs']} songs in {summary['working_path']}")
+
+
+if __name__ == "__main__":
+    main()
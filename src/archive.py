@@ -0,0 +1,149 @@
+import io
+import os
+import shutil
+import sys
+import tarfile
+import time
+import zipfile
+from concurrent.futures import Future
+from queue import Queue
+from threading import Thread
+
+FORMATS = ("zip", "tar")
+
+QUEUE_SIZE = 64
+"""Entries waiting for the writer before adding more blocks."""
+
+BUFFER_SIZE = 1 << 20
+
+
+def archive_format(path: str) -> str | None:
+    """Format of an archive going by its file name."""
+    name = path.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith(".tar"):
+        return "tar"
+    return None
+
+
+class ArchiveWriter:
+    """Writes entries to a zip or tar archive on a single thread, in the
+    order they are added, so exporters can stream into one archive.
+
+    `path` may be "-" for stdout; both formats are written without
+    seeking, so pipes work too. Zip entries are deflated or stored per
+    entry; tar entries are always stored."""
+
+    def __init__(self, path: str, format: str):
+        if format not in FORMATS:
+            raise ValueError(f"unknown archive format {format!r}")
+        self.path = path
+        self.format = format
+        self.__queue: Queue[tuple | None] = Queue(maxsize=QUEUE_SIZE)
+        self.__error: BaseException = None
+
+        if path == "-":
+            self.__file = sys.__stdout__.buffer
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.__file = open(path, "wb")
+
+        if format == "zip":
+            self.__zip = zipfile.ZipFile(self.__file, "w", allowZip64=True)
+        else:
+            self.__tar = tarfile.open(
+                fileobj=self.__file, mode="w|", format=tarfile.PAX_FORMAT
+            )
+
+        self.__thread = Thread(target=self.__writer, name="archive-writer")
+        self.__thread.start()
+
+    def add_file(self, arcname: str, path: str, compress: bool, remove=False) -> Future:
+        """Queue a file to be added, blocking while the queue is full.
+
+        With `remove`, the file is deleted once it's in the archive.
+        The future is done once the entry is written."""
+        future = Future()
+        self.__queue.put((future, arcname, path, None, compress, remove))
+        return future
+
+    def add_bytes(self, arcname: str, data: bytes, compress: bool) -> Future:
+        """Queue generated contents to be added, blocking while the queue is full."""
+        future = Future()
+        self.__queue.put((future, arcname, None, data, compress, False))
+        return future
+
+    def close(self):
+        """Write out queued entries and finish the archive."""
+        self.__queue.put(None)
+        self.__thread.join()
+
+        if self.format == "zip":
+            self.__zip.close()
+        else:
+            self.__tar.close()
+        if self.__file is not sys.__stdout__.buffer:
+            self.__file.close()
+        else:
+            self.__file.flush()
+
+        if self.__error is not None:
+            raise self.__error
+
+    def __writer(self):
+        while (entry := self.__queue.get()) is not None:
+            future, arcname, path, data, compress, remove = entry
+            if self.__error is not None:
+                # the archive is broken past this point
+                future.set_exception(self.__error)
+                continue
+
+            try:
+                if self.format == "zip":
+                    self.__write_zip(arcname, path, data, compress)
+                else:
+                    self.__write_tar(arcname, path, data)
+            except BaseException as e:
+                self.__error = e
+                future.set_exception(e)
+                continue
+
+            if remove:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    future.set_exception(e)
+                    continue
+            future.set_result(None)
+
+    def __write_zip(self, arcname: str, path: str, data: bytes, compress: bool):
+        if path is not None:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+        else:
+            info = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            info.external_attr = 0o644 << 16
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+
+        if path is None:
+            self.__zip.writestr(info, data)
+            return
+        with open(path, "rb") as src, self.__zip.open(info, "w") as dest:
+            shutil.copyfileobj(src, dest, BUFFER_SIZE)
+
+    def __write_tar(self, arcname: str, path: str, data: bytes):
+        # not gettarinfo, which would turn files sharing an inode into links
+        info = tarfile.TarInfo(arcname)
+        if path is None:
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self.__tar.addfile(info, io.BytesIO(data))
+            return
+
+        with open(path, "rb") as src:
+            st = os.fstat(src.fileno())
+            info.size = st.st_size
+            info.mtime = int(st.st_mtime)
+            info.mode = 0o644
+            self.__tar.addfile(info, src)
@@ -0,0 +1,246 @@
+"""Headless batch export and video conversion, without the UI.
+
+Run from the project root:
+    PYTHONPATH=src python -m cli export --output out [--audio mp3] [--workers 8]
+    PYTHONPATH=src python -m cli videos --source <WAC>/.../Content/Movie
+or:
+    python src/cli.py export --output out
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+import data.database as database
+from archive import FORMATS, archive_format
+from data.task import ConsoleProgress, TaskState
+from data.videos import convert_videos
+from export import (
+    ExportOptions,
+    ExportPools,
+    export_song,
+    open_output,
+    open_transcode_cache,
+)
+from transcode_cache import CACHE_DIRNAME, DEFAULT_MAX_BYTES
+from transfer import DEFAULT_STRATEGIES, STRATEGIES
+from util import default_ffmpeg_jobs
+
+
+def strategies(arg: str) -> tuple[str, ...]:
+    names = tuple(arg.split(","))
+    for name in names:
+        if name not in STRATEGIES:
+            raise argparse.ArgumentTypeError(
+                f"unknown strategy {name!r}; choose from {', '.join(STRATEGIES)}"
+            )
+    return names
+
+
+def scan() -> bool:
+    """Run the same setup tasks as the data setup window, minus jackets."""
+    for name, task in (
+        ("Metadata", database.init_songs),
+        ("Audio", database.init_audio),
+    ):
+        progress = ConsoleProgress(name)
+        try:
+            task(progress)
+        except Exception as e:
+            print(f"[{name}] ERROR: {e}", file=sys.stderr)
+            return False
+        if progress.state == TaskState.Error:
+            return False
+    return True
+
+
+def export(args: argparse.Namespace) -> int:
+    if args.working is not None:
+        config.working_path = os.path.abspath(args.working)
+    if args.output is not None:
+        config.export_path = os.path.abspath(args.output)
+
+    if not scan():
+        return 2
+
+    ids = args.songs if args.songs else list(database.metadata.keys())
+    unknown = [id for id in ids if id not in database.metadata]
+    if len(unknown) > 0:
+        print(f"Unknown song IDs: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    options = ExportOptions(
+        output_path=config.export_path,
+        audio_target=args.audio if args.audio != "wav" else None,
+        game_subfolders=args.game_subfolders,
+        exclude_videos=args.exclude_videos,
+        delete_originals=args.delete_originals,
+        workers=args.workers,
+        encoders=args.encoders,
+        transfer=(
+            ("hardlink", *args.transfer)
+            if args.hardlink and "hardlink" not in args.transfer
+            else args.transfer
+        ),
+        transcode_cache=(
+            None
+            if args.no_transcode_cache
+            else args.transcode_cache
+            or os.path.join(config.working_path, CACHE_DIRNAME)
+        ),
+        transcode_cache_bytes=int(args.transcode_cache_gib * (1 << 30)),
+        archive=args.archive,
+        archive_format=(
+            args.archive_format or archive_format(args.archive or "") or "zip"
+        ),
+    )
+    return export_songs(ids, options)
+
+
+def export_songs(ids: list[str], options: ExportOptions) -> int:
+    print(f"Exporting {len(ids)} songs to {options.archive or options.output_path}...")
+
+    errors = 0
+    alerted = 0
+    cache = open_transcode_cache(options)
+    with ThreadPoolExecutor(options.workers) as pool, ExportPools(options) as pools:
+        output = open_output(options, pools)
+        futures = {
+            pool.submit(
+                export_song, database.metadata[id], options, pools, output, cache
+            ): id
+            for id in ids
+        }
+        for done, f in enumerate(as_completed(futures), start=1):
+            id = futures[f]
+            try:
+                alerts = f.result()
+            except Exception as e:
+                errors += 1
+                print(f"[{done}/{len(ids)}] {id}: ERROR: {e}")
+                continue
+            if len(alerts) > 0:
+                alerted += 1
+                print(f"[{done}/{len(ids)}] {id}: {'; '.join(alerts)}")
+            else:
+                print(f"[{done}/{len(ids)}] {id}: ok")
+    try:
+        output.close()
+    except Exception as e:
+        print(f"ERROR: could not finish {options.archive}: {e}")
+        errors += 1
+    if cache is not None:
+        cache.close()
+
+    print(
+        f"Exported {len(ids) - errors}/{len(ids)} songs"
+        f" ({alerted} with warnings, {errors} failed)."
+    )
+    return 1 if errors > 0 else 0
+
+
+def videos(args: argparse.Namespace) -> int:
+    if args.working is not None:
+        config.working_path = os.path.abspath(args.working)
+    if args.source is not None:
+        config.video_source_path = os.path.abspath(args.source)
+
+    progress = ConsoleProgress("Videos")
+    convert_videos(progress, args.jobs)
+    return 0 if progress.state == TaskState.Complete else 1
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="cli", description="WacK Repackager")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("export", help="export songs as WacK packages")
+    p.add_argument("--working", help="working folder (default: from config.ini)")
+    p.add_argument("--output", help="export folder (default: from config.ini)")
+    p.add_argument(
+        "--audio",
+        choices=("wav", "mp3", "ogg"),
+        default="wav",
+        help="audio format; anything but wav is converted with ffmpeg",
+    )
+    p.add_argument("--game-subfolders", action="store_true")
+    p.add_argument("--exclude-videos", action="store_true")
+    p.add_argument("--delete-originals", action="store_true")
+    p.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 4,
+        help="songs exported at once, and concurrent file copies",
+    )
+    p.add_argument(
+        "--encoders",
+        type=int,
+        default=default_ffmpeg_jobs(),
+        help="concurrent ffmpeg encodes, sharing the cores between them",
+    )
+    p.add_argument(
+        "--transfer",
+        type=strategies,
+        default=DEFAULT_STRATEGIES,
+        help="comma-separated ways to copy files, tried in order"
+        f" (default: {','.join(DEFAULT_STRATEGIES)}; also: hardlink)",
+    )
+    p.add_argument(
+        "--hardlink",
+        action="store_true",
+        help="hardlink files to the working folder when possible instead of"
+        " copying them; editing exported files in place then changes the originals",
+    )
+    p.add_argument(
+        "--transcode-cache",
+        metavar="DIR",
+        help=f"where to keep converted audio (default: <working>/{CACHE_DIRNAME})",
+    )
+    p.add_argument("--no-transcode-cache", action="store_true")
+    p.add_argument(
+        "--transcode-cache-gib",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1 << 30),
+        help="size to trim the transcode cache to (default: %(default)s)",
+    )
+    p.add_argument(
+        "--archive",
+        metavar="FILE",
+        help="write a zip or tar archive instead of a folder; - for stdout",
+    )
+    p.add_argument(
+        "--archive-format",
+        choices=FORMATS,
+        help="default: from the archive's extension, otherwise zip",
+    )
+    p.add_argument("--songs", nargs="+", metavar="ID", help="only export these songs")
+    p.set_defaults(func=export)
+
+    p = commands.add_parser(
+        "videos", help="convert the game's .usm videos into the working folder"
+    )
+    p.add_argument("--working", help="working folder (default: from config.ini)")
+    p.add_argument("--source", help="game's Movie folder (default: from config.ini)")
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=default_ffmpeg_jobs(),
+        help="concurrent conversions (default: %(default)s)",
+    )
+    p.set_defaults(func=videos)
+
+    args = parser.parse_args(argv)
+    config.load()
+    if getattr(args, "archive", None) == "-":
+        # keep stdout for the archive
+        with contextlib.redirect_stdout(sys.stderr):
+            return args.func(args)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    # Assume app is being run at the project root.
+    sys.exit(main())
@@ -12,6 +12,8 @@ True: config file loaded successfully"""
 
 working_path: str = os.path.abspath("./data")
 export_path: str = os.path.abspath("./out")
+video_source_path: str = ""
+"""Game's Movie folder with .usm videos to convert into the working folder."""
 
 
 def load():
@@ -22,10 +24,13 @@ def load():
         cfg_file_loaded = False  # config file missing, unreadable, or bad format
         return
 
-    global working_path, export_path
+    global working_path, export_path, video_source_path
 
     working_path = cfp.get("paths", "working_path", fallback=working_path)
     export_path = cfp.get("paths", "export_path", fallback=export_path)
+    video_source_path = cfp.get(
+        "paths", "video_source_path", fallback=video_source_path
+    )
 
     cfg_file_loaded = True
 
@@ -40,6 +45,7 @@ def save():
     cfp.add_section("paths")
     cfp["paths"]["working_path"] = working_path
     cfp["paths"]["export_path"] = export_path
+    cfp["paths"]["video_source_path"] = video_source_path
 
     cfp.set("paths", "working_path", working_path)
     cfp.set("paths", "export_path", export_path)
@@ -0,0 +1,85 @@
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import tracing
+
+SCAN_WORKERS = 16
+"""Charts are read over I/O, so use more threads than cores."""
+
+_CHART_FILE = re.compile(r"(\d\d)\.mer$")
+_MUSIC_FILE_PATH = re.compile(r"#MUSIC_FILE_PATH\s+\S*?(S\d\d_\d\d\d)")
+_OFFSET = re.compile(r"#OFFSET\s+(\S+)")
+
+
+def read_chart_header(path: str) -> tuple[str | None, str | None]:
+    """Audio ID (Snn-nnn) and offset from a chart's header, without reading its notes."""
+    a_id = None
+    offset = None
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        for line in f:
+            line = line.lstrip()
+            if not line.startswith("#"):
+                if line.strip() != "":
+                    break  # first note line
+                continue
+            if line.startswith("#BODY"):
+                break
+
+            if a_id is None and (m := _MUSIC_FILE_PATH.match(line)) is not None:
+                a_id = m.group(1).replace("_", "-")
+            elif offset is None and (m := _OFFSET.match(line)) is not None:
+                offset = m.group(1)
+
+            if a_id is not None and offset is not None:
+                break
+    return a_id, offset
+
+
+def scan_song_charts(
+    mer_dir: str,
+) -> tuple[list[tuple[str | None, str | None] | None], list[str]]:
+    """Read the headers of a song's charts.
+
+    Returns (audio ID, offset) per difficulty (None if there's no chart),
+    and the chart files that were read."""
+    with tracing.span("chart headers", song=os.path.basename(mer_dir)):
+        return _scan_song_charts(mer_dir)
+
+
+def _scan_song_charts(
+    mer_dir: str,
+) -> tuple[list[tuple[str | None, str | None] | None], list[str]]:
+    level_audio: list[tuple[str | None, str | None] | None] = [None, None, None, None]
+    paths: list[str] = []
+    try:
+        entries = list(os.scandir(mer_dir))
+    except FileNotFoundError:
+        return level_audio, paths
+
+    for entry in entries:
+        m = _CHART_FILE.search(entry.name)
+        if m is None or not entry.is_file():
+            continue
+        paths.append(entry.path)
+
+        level_audio[int(m.group(1))] = read_chart_header(entry.path)
+    tracing.count("chart headers read", len(paths))
+    return level_audio, paths
+
+
+class ChartScanner:
+    """Reads songs' chart headers on a thread pool as they are submitted."""
+
+    def __init__(self, workers: int = SCAN_WORKERS):
+        self.__pool = ThreadPoolExecutor(workers, thread_name_prefix="chart-scan")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.__pool.shutdown(cancel_futures=True)
+
+    def submit(self, mer_dir: str) -> Future:
+        """Future of scan_song_charts(mer_dir)."""
+        return self.__pool.submit(scan_song_charts, mer_dir)
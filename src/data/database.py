@@ -1,16 +1,34 @@
+from __future__ import annotations
+
+import contextlib
 import csv
 import os
-import re
-import json
-from typing import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context
+from queue import Empty, Queue
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator
 
 from PIL import Image
 
 import config
+import tracing
 from util import awb_index, resource_path, song_id_from_int
-from ui.data_setup import TaskProgress, TaskState
-from ui.tabs.listing_tab import ListingTab
+from . import music_table
+from .charts import ChartScanner
+from .jacket_cache import (
+    PROCESS_POOL_MIN,
+    JacketCache,
+    decode_thumbnail,
+    make_thumbnail,
+    thumbnail_image,
+)
 from .metadata import Difficulty, DifficultyName, SongMetadata
+from .scan_index import Fingerprint, ScanIndex, fingerprint
+from .snapshot import DirSnapshot
+from .task import TaskState
+
+if TYPE_CHECKING:
+    from ui.data_setup import TaskProgress
 
 ## NOTE: ID KEYS ARE HYPHENATED
 ## S03-014, not S03_014
@@ -24,7 +42,7 @@ audio_file: dict[str, str] = dict()
 """ID to audio filename"""
 
 jacket_preview: dict[str, Image.Image] = dict()
-"""ID to resized PIL Image of jacket"""
+"""ID to resized PIL Image of jacket, backed by the memory-mapped thumbnail atlas"""
 
 jacket_file: dict[str, str] = dict()
 """ID to jacket filename"""
@@ -52,215 +70,240 @@ missing_jackets: list[str] = list()
 #     # print(audio_file)
 
 
-def init_songs(progress: TaskProgress):
+class SongFeed:
+    """Songs handed from init_songs to tasks running alongside it, as
+    soon as each is finalized."""
+
+    def __init__(self):
+        self.__queues: list[Queue[SongMetadata | None]] = []
+        self.__closed = False
+        self.__failed = False
+
+    def listen(self) -> Iterator[SongMetadata]:
+        """Songs put from now on, until the feed is closed. Listen before
+        init_songs starts to get every song. Raises RuntimeError at the end
+        if the scan putting the songs failed."""
+        queue = Queue()
+        self.__queues.append(queue)
+        return self.__songs(queue)
+
+    def __songs(self, queue: Queue[SongMetadata | None]) -> Iterator[SongMetadata]:
+        while (song := queue.get()) is not None:
+            yield song
+        if self.__failed:
+            raise RuntimeError("the songs scan failed")
+
+    def put(self, song: SongMetadata):
+        for queue in self.__queues:
+            queue.put(song)
+
+    def close(self, failed=False):
+        """End every listener's songs; closing again does nothing."""
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__failed = failed
+        for queue in self.__queues:
+            queue.put(None)
+
+
+def init_songs(progress: TaskProgress, feed: SongFeed = None):
+    """Scan songs into metadata. With `feed`, each song is also put to it
+    once finalized, and it's closed when done, even on errors."""
+    try:
+        __init_songs(progress, feed.put if feed is not None else lambda song: None)
+    except BaseException:
+        if feed is not None:
+            feed.close(failed=True)
+        raise
+    if feed is not None:
+        feed.close()
+
+
+def __init_songs(progress: TaskProgress, publish: Callable[[SongMetadata], None]):
     metadata_path = os.path.join(config.working_path, "metadata.json")
     videos_dir = os.path.join(config.working_path, "movies")
     jackets_dir = os.path.join(config.working_path, "jackets")
     print(f"Initializing charts metadata from {metadata_path}...")
 
     metadata.clear()
-    md_json: list
+    index: ScanIndex = None
     try:
-        with open(metadata_path, "r", encoding="utf_8") as read_file:
-            md_json = json.load(read_file)["Exports"][0]["Table"]["Data"]
-
-        for elem in md_json:  # songs
-            id: str = None
-            genre: int = None
-            name: str = None
-            artist: str = None
-            rubi: str = None
-            copyright: str = None
-            tempo: str = None
-            version: int = None
-            audio_preview: str = None
-            audio_preview_len: str = None
-            background_video: list[str] = [None, None, None, None]
-            levels: list[str] = [None, None, None, None]
-            level_audio: list[str] = [None, None, None, None]  # from .mer
-            level_designer: list[str] = [None, None, None, None]
-            level_clear_requirements: list[str] = [None, None, None, None]
-            jacket_path: str = None
-
-            # MusicParameterTable JSON parsing
-            for key in elem["Value"]:  # properties of song
-                if key["Name"] == "AssetDirectory":
-                    id = key["Value"]
-                # SongInfo
-                elif key["Name"] == "ScoreGenre":
-                    genre = int(key["Value"])
-                elif key["Name"] == "MusicMessage":
-                    name = key["Value"]
-                elif key["Name"] == "ArtistMessage":
-                    artist = key["Value"]
-                elif key["Name"] == "Rubi":
-                    rubi = key["Value"]
-                elif key["Name"] == "Bpm":
-                    tempo = key["Value"]
-                elif key["Name"] == "CopyrightMessage" and key["Value"] not in [
-                    "",
-                    "-",
-                    None,
-                ]:
-                    copyright = key["Value"]
-                elif key["Name"] == "VersionNo":
-                    version = key["Value"]
-                elif key["Name"] == "JacketAssetName":
-                    jacket_path = key["Value"]
-                # ChartInfo Levels; "+0" = no chart
-                elif key["Name"] == "DifficultyNormalLv":
-                    levels[0] = round(float(key["Value"]), 2)
-                elif key["Name"] == "DifficultyHardLv":
-                    levels[1] = round(float(key["Value"]), 2)
-                elif key["Name"] == "DifficultyExtremeLv":
-                    levels[2] = round(float(key["Value"]), 2)
-                elif key["Name"] == "DifficultyInfernoLv":
-                    levels[3] = round(float(key["Value"]), 2)
-                # Audio Previews
-                elif key["Name"] == "PreviewBeginTime":
-                    audio_preview = round(float(key["Value"]), 2)
-                elif key["Name"] == "PreviewSeconds":
-                    audio_preview_len = round(float(key["Value"]), 2)
-                # Clear Requirements
-                elif key["Name"] == "ClearNormaRateNormal":
-                    level_clear_requirements[0] = round(float(key["Value"]), 2)
-                elif key["Name"] == "ClearNormaRateHard":
-                    level_clear_requirements[1] = round(float(key["Value"]), 2)
-                elif key["Name"] == "ClearNormaRateExtreme":
-                    level_clear_requirements[2] = round(float(key["Value"]), 2)
-                elif key["Name"] == "ClearNormaRateInferno":
-                    level_clear_requirements[3] = round(float(key["Value"]), 2)
-                # ChartInfo Designers
-                elif key["Name"] == "NotesDesignerNormal":
-                    level_designer[0] = key["Value"]
-                elif key["Name"] == "NotesDesignerHard":
-                    level_designer[1] = key["Value"]
-                elif key["Name"] == "NotesDesignerExpert":
-                    level_designer[2] = key["Value"]
-                elif key["Name"] == "NotesDesignerInferno":
-                    level_designer[3] = key["Value"]
-                # Video Backgrounds
-                elif key["Name"] == "MovieAssetName" and key["Value"] not in [
-                    "",
-                    "-",
-                    None,
-                ]:
-                    background_video[0] = key["Value"]
-                elif key["Name"] == "MovieAssetNameHard" and key["Value"] not in [
-                    "",
-                    "-",
-                    None,
-                ]:
-                    background_video[1] = key["Value"]
-                elif key["Name"] == "MovieAssetNameExpert" and key["Value"] not in [
-                    "",
-                    "-",
-                    None,
-                ]:
-                    background_video[2] = key["Value"]
-                elif key["Name"] == "MovieAssetNameInferno" and key["Value"] not in [
-                    "",
-                    "-",
-                    None,
-                ]:
-                    background_video[3] = key["Value"]
-
-            if "S99" in id:
-                # print('Skipping system song...')
-                continue
-
-            # check for existence of video file
-            for i, f in enumerate(background_video):
-                if f is not None:
-                    file = f"{f}.mp4"
-                    path = os.path.join(os.path.join(videos_dir, file))
-                    if not os.path.exists(path):
-                        progress.log(
-                            f"WARNING: Could not find video file for {id} ({DifficultyName(i)})!"
+        # reuse songs whose sources haven't changed since the last scan
+        index = ScanIndex(config.working_path)
+        if not index.persistent:
+            progress.log(f"WARNING: Could not open scan index at {index.path}!")
+            progress.log(f"    {index.error}")
+            progress.log("    Every start will rescan the whole working folder.")
+        cached: dict[str, SongMetadata] = dict()
+        cached_warnings: dict[str, list[str]] = dict()
+        with tracing.span("scan index load"):
+            if index.sources_fresh([metadata_path]):
+                cached, stale = index.load_songs()
+                cached_warnings = index.load_song_warnings()
+            if len(cached) > 0 and len(stale) == 0:
+                metadata.update(cached)
+                for id, song in metadata.items():
+                    publish(song)
+                    # same log as scanning it
+                    for line in cached_warnings.get(id, []):
+                        progress.log(line)
+                progress.log(f"Loaded {len(metadata)} songs from scan index.")
+                progress.pbar_set(prog=100)
+                progress.status_set(TaskState.Complete)
+                return
+        song_sources: dict[str, list[str]] = dict()
+        # logged again when the song is loaded from the scan index
+        song_warnings: dict[str, list[str]] = dict()
+
+        def warn(id: str, line: str):
+            song_warnings[id].append(line)
+            progress.log(line)
+
+        # songs in metadata.json order; no chart scan if reused from the index
+        pending: list[tuple[music_table.SongRow, Future | None]] = []
+        with ChartScanner() as scanner:
+            with tracing.span("metadata.json parse"):
+                for row in music_table.iter_songs(metadata_path):  # songs
+                    if "S99" in row.id:
+                        # print('Skipping system song...')
+                        continue
+
+                    if row.id in cached:
+                        pending.append((row, None))
+                        continue
+
+                    # mer difficulty-audio IDs, read in the background
+                    mer_dir = os.path.join(config.working_path, "MusicData", row.id)
+                    pending.append((row, scanner.submit(mer_dir)))
+
+            progress.pbar_set(prog=0, maximum=len(pending))
+            videos = DirSnapshot(videos_dir)
+            jackets = DirSnapshot(jackets_dir)
+            for done, (row, chart_scan) in enumerate(pending, start=1):
+                id = row.id
+                if chart_scan is None:
+                    metadata[id] = cached[id]
+                    publish(metadata[id])
+                    for line in cached_warnings.get(id, []):
+                        progress.log(line)
+                    continue
+                background_video = row.background_video
+                jacket_path = row.jacket_path
+
+                # paths whose changes invalidate this song in the scan index
+                sources = song_sources[id] = list()
+                song_warnings[id] = list()
+
+                # check for existence of video file
+                for i, f in enumerate(background_video):
+                    if f is not None:
+                        file = f"{f}.mp4"
+                        path = os.path.join(os.path.join(videos_dir, file))
+                        sources.append(path)
+                        if not videos.isfile(path):
+                            warn(
+                                id,
+                                f"WARNING: Could not find video file for {id} ({DifficultyName(i)})!",
+                            )
+                            warn(id, f"    {path}")
+                            background_video[i] = None
+                        else:
+                            background_video[i] = path
+
+                with tracing.span("chart scan wait"):
+                    level_audio, charts = chart_scan.result()
+                sources.append(os.path.join(config.working_path, "MusicData", id))
+                sources += charts
+
+                # difficulty iteration -- level_audio has None for diffs w/o chart
+                difficulties: list[Difficulty] = [None, None, None, None]
+                for i, audio in enumerate(level_audio):
+                    if audio is None:
+                        continue
+                    if audio[0] is None:
+                        warn(
+                            id,
+                            f"WARNING: {DifficultyName(i).name} chart of {id} has no audio!",
                         )
-                        progress.log(f"    {path}")
-                        background_video[i] = None
-                    else:
-                        background_video[i] = path
-
-            # mer difficulty-audio IDs
-            mer_dir = os.path.join(config.working_path, "MusicData", id)
-            for _, _, files in os.walk(f"{mer_dir}"):
-                for f in files:
-                    diff_idx = int(re.search(r"\d\d.mer", f).group()[:2])
-
-                    lines: list[str]
-                    with open(os.path.join(mer_dir, f), "r") as chf:
-                        lines = chf.readlines()
-                    a_id = None
-                    offset = None
-                    for l in lines:
-                        if "MUSIC_FILE_PATH" in l:
-                            a_id = re.search(r"S\d\d_\d\d\d", l.split()[1]).group()
-                        elif "OFFSET" in l:
-                            offset = l.split()[1]
-                        if a_id and offset:
+                        continue
+                    diff = Difficulty(
+                        audio_id=audio[0],
+                        audio_offset=audio[1],
+                        audio_preview_time=row.audio_preview,
+                        audio_preview_duration=row.audio_preview_len,
+                        video=background_video[i],
+                        designer=row.level_designer[i],
+                        clearRequirement=row.level_clear_requirements[i],
+                        diffLevel=row.levels[i],
+                    )
+                    # use base video bg if video bg for this diff doesn't exist
+                    if (
+                        i != 0
+                        and background_video[i] is None
+                        and background_video[0] is not None
+                    ):
+                        diff.video = background_video[0]
+                    difficulties[i] = diff
+
+                # jacket path to png
+                mer_root = os.path.join(jackets_dir, *jacket_path.split("/"))
+                sources.append(mer_root)
+                sources.append(f"{mer_root}.png")
+                if jackets.isdir(mer_root):
+                    for f in jackets.listdir(mer_root):
+                        if f.endswith(".png"):
+                            jacket_path = os.path.join(mer_root, f)
                             break
-
-                    a_id = a_id.replace("_", "-")
-                    level_audio[diff_idx] = (a_id, offset)
-
-            # difficulty iteration -- level_audio has None for diffs w/o chart
-            difficulties: list[Difficulty] = [None, None, None, None]
-            for i, audio in enumerate(level_audio):
-                if audio is None:
-                    continue
-                diff = Difficulty(
-                    audio_id=audio[0],
-                    audio_offset=audio[1],
-                    audio_preview_time=audio_preview,
-                    audio_preview_duration=audio_preview_len,
-                    video=background_video[i],
-                    designer=level_designer[i],
-                    clearRequirement=level_clear_requirements[i],
-                    diffLevel=levels[i],
+                else:
+                    jacket_path = f"{mer_root}.png"
+
+                if jacket_path is None or not jackets.isfile(jacket_path):
+                    jacket_path = None
+                    warn(id, f"WARNING: Could not find jacket for {id}!")
+                else:
+                    sources.append(jacket_path)
+
+                metadata[id] = SongMetadata(
+                    id=id,
+                    name=row.name,
+                    artist=row.artist,
+                    rubi=row.rubi,
+                    genre_id=row.genre,
+                    copyright=row.copyright,
+                    tempo=row.tempo,
+                    version=row.version,
+                    difficulties=difficulties,
+                    jacket=jacket_path,
                 )
-                # use base video bg if video bg for this diff doesn't exist
-                if (
-                    i != 0
-                    and background_video[i] is None
-                    and background_video[0] is not None
-                ):
-                    diff.video = background_video[0]
-                difficulties[i] = diff
-
-            # jacket path to png
-            mer_root = os.path.join(jackets_dir, *jacket_path.split("/"))
-            if os.path.isdir(mer_root):
-                for f in os.listdir(mer_root):
-                    if f.endswith(".png"):
-                        jacket_path = os.path.join(mer_root, f)
-                        break
-            else:
-                jacket_path = f"{mer_root}.png"
-
-            if jacket_path is None or not os.path.exists(jacket_path):
-                jacket_path = None
-                progress.log(f"WARNING: Could not find jacket for {id}!")
-
-            metadata[id] = SongMetadata(
-                id=id,
-                name=name,
-                artist=artist,
-                rubi=rubi,
-                genre_id=genre,
-                copyright=copyright,
-                tempo=tempo,
-                version=version,
-                difficulties=difficulties,
-                jacket=jacket_path,
+                publish(metadata[id])
+                progress.pbar_set(prog=done)
+
+        def source_fingerprint(path: str) -> Fingerprint:
+            for snapshot in (videos, jackets):
+                fp = snapshot.fingerprint(path)
+                if fp is not None:
+                    return fp
+            return fingerprint(path)
+
+        with tracing.span("scan index store"):
+            index.store_songs(
+                {id: metadata[id] for id in song_sources},
+                song_sources,
+                source_fingerprint,
+                song_warnings,
             )
+            index.retain_songs(metadata.keys())
+            index.store_sources([metadata_path])
     except Exception as e:
         progress.log(f"FATAL: Error occurred!")
         progress.status_set(TaskState.Error)
         raise e
+    finally:
+        if index is not None:
+            index.close()
 
-    progress.pbar_set(prog=100)
+    progress.pbar_set(prog=1, maximum=1)
     progress.status_set(TaskState.Complete)
     progress.log(f"Found {len(metadata)} songs.")
     progress.log("  NOTE: Metadata covers videos and charts as well!")
@@ -284,22 +327,49 @@ def __init_audio_index(progress: TaskProgress):
     progress.pbar_set(prog=0, maximum=len(audio_index))
 
 
+def __scan_awb_folder(path: str) -> tuple[list[str | None], list[str]]:
+    """WAVs of an extracted AWB folder, listed once.
+
+    Returns their paths indexed by cue number (None for gaps), and the
+    paths of other WAVs in it."""
+    cues: list[str | None] = []
+    others: list[str] = []
+    with os.scandir(path) as entries:
+        for e in entries:
+            stem, ext = os.path.splitext(e.name)
+            if ext.lower() != ".wav":
+                continue
+            if not stem.isdigit():
+                others.append(e.path)
+                continue
+            cue = int(stem)
+            if cue >= len(cues):
+                cues.extend([None] * (cue + 1 - len(cues)))
+            cues[cue] = e.path
+    return cues, others
+
+
 def __init_audio_paths(progress: TaskProgress):
     audio_dir = os.path.join(config.working_path, "MER_BGM")
     print(f"Finding audio in {audio_dir}...")
 
-    # untouched files set to figure out which files weren't added
-    # used for trying to fix holes in awb.csv
-    untouched = set()
-
-    # populate with full-path wav files in audio_dir
-    for root, _, files in os.walk(audio_dir):
-        for f in files:
-            if "wav" in f:
-                untouched.add(os.path.join(root, f))
+    # AWB folder name to its WAVs by cue number
+    folders: dict[str, list[str | None]] = dict()
+    others: list[str] = []
+    try:
+        with os.scandir(audio_dir) as entries:
+            awb_dirs = [e for e in entries if e.is_dir()]
+    except FileNotFoundError:
+        awb_dirs = []
+    for e in awb_dirs:
+        folders[e.name], folder_others = __scan_awb_folder(e.path)
+        others += folder_others
 
     # populate audio_file with audio_index
     audio_file.clear()
+    # (folder, cue) of the files used, to report the ones that weren't
+    # used for trying to fix holes in awb.csv
+    used: set[tuple[str, int]] = set()
     for k, v in audio_index.items():
         if v is None:
             progress.log(f"WARNING: audio ID {k} has no cue index!!")
@@ -308,31 +378,69 @@ def __init_audio_paths(progress: TaskProgress):
             progress.log(f"    This audio ID will have no sound!")
             continue
 
-        f = os.path.join(audio_dir, v[0], f"{v[1]}.wav")
-        f_eq = os.path.join(audio_dir, v[0], f"{v[1]+1}.wav")
+        folder, cue = v
+        cues = folders.get(folder, [])
+        f = cues[cue] if cue < len(cues) else None
 
-        if os.path.exists(f):
+        if f is not None:
             if audio_file.get(k) is not None:
                 progress.log(
                     f"WARNING: Duplicate audio ID {k}! Overwriting {audio_file[k]} with {f}"
                 )
 
             audio_file[k] = f
-            untouched.remove(f)
-            untouched.remove(f_eq)
+            # each song's audio is followed by its equivalent
+            used.add((folder, cue))
+            used.add((folder, cue + 1))
             progress.pbar_set(prog=len(audio_file))
         else:
+            f = os.path.join(audio_dir, folder, f"{cue}.wav")
             progress.log(f"WARNING: Could not find audio for {k} ({f})!")
     progress.log(f"Found {len(audio_file)}/{len(audio_index)} audio files.")
 
+    present = {
+        (folder, cue)
+        for folder, cues in folders.items()
+        for cue, f in enumerate(cues)
+        if f is not None
+    }
+    untouched = sorted(
+        [folders[folder][cue] for folder, cue in present - used] + others
+    )
     print(f"{len(untouched)} files weren't added:")
-    for f in sorted(untouched):
+    for f in untouched:
         print(f"  {f}")
 
 
+def __audio_sources() -> list[str]:
+    """Paths whose changes invalidate the audio paths in the scan index."""
+    audio_dir = os.path.join(config.working_path, "MER_BGM")
+    sources = [resource_path("assets/awb.csv"), audio_dir]
+    if os.path.isdir(audio_dir):
+        with os.scandir(audio_dir) as entries:
+            sources += sorted(e.path for e in entries if e.is_dir())
+    return sources
+
+
 def init_audio(progress: TaskProgress):
-    __init_audio_index(progress)
-    __init_audio_paths(progress)
+    with tracing.span("awb.csv read"):
+        __init_audio_index(progress)
+
+    with contextlib.closing(ScanIndex(config.working_path)) as index:
+        sources = __audio_sources()
+        cached = index.load_audio() if index.sources_fresh(sources) else dict()
+        if len(cached) > 0:
+            audio_file.clear()
+            audio_file.update(cached)
+            progress.log(
+                f"Loaded {len(audio_file)}/{len(audio_index)} audio files"
+                " from scan index."
+            )
+        else:
+            with tracing.span("audio paths"):
+                __init_audio_paths(progress)
+            index.store_audio(audio_file)
+            index.store_sources(sources)
 
     if len(audio_file) < len(audio_index):
         progress.status_set(TaskState.Alert)
@@ -342,21 +450,125 @@ def init_audio(progress: TaskProgress):
     progress.pbar_set(prog=len(audio_file))
 
 
-def jackets_progress_task(progress: TaskProgress):
+def jackets_progress_task(progress: TaskProgress, songs: Iterable[SongMetadata] = None):
+    """Make jacket previews, decoding new and changed jackets into the atlas.
+
+    `songs`, like from a SongFeed, are thumbnailed as they come in;
+    without it, the songs in metadata are."""
+    if songs is None:
+        songs = list(metadata.values())
+    total = 0
     jackets_present = 0
-    for k in metadata:
-        if metadata[k].jacket is not None:
-            jackets_present += 1
-            jacket_preview[k] = Image.open(metadata[k].jacket).resize((200, 200))
-        progress.pbar_set(prog=jackets_present, maximum=len(metadata))
+    jackets_done = 0
+    decoded: dict[str, tuple[str, Fingerprint]] = dict()
+    """ID to jacket path and fingerprint of the jackets decoded"""
+    jacket_preview.clear()
+    cache = JacketCache(config.working_path)
+    if not cache.persistent:
+        progress.log(f"WARNING: Could not open jacket atlas at {cache.path}!")
+        progress.log(f"    {cache.error}")
+        progress.log("    Every start will decode all jackets again.")
+
+    # decode on all cores, once there are enough jackets to start processes for
+    workers = os.cpu_count() or 1
+    pool: ProcessPoolExecutor = None
+    waiting: list[str] = []
+    finished: Queue[tuple[str, Future]] = Queue()
+    """Decodes done by the pool, stored on this thread as they finish"""
+
+    def submit(ids: list[str]):
+        for k in ids:
+            future = pool.submit(decode_thumbnail, decoded[k][0])
+            future.add_done_callback(lambda f, k=k: finished.put((k, f)))
+
+    def store(k: str, pixels: bytes):
+        nonlocal jackets_done
+        cache.put(*decoded[k], pixels)
+        jacket_preview[k] = thumbnail_image(pixels)
+        jackets_done += 1
+        tracing.count("jackets decoded")
+
+    def store_finished(block: bool) -> int:
+        """Store decodes the pool finished, waiting for one if `block`."""
+        count = 0
+        while True:
+            try:
+                k, future = finished.get(block=block and count == 0)
+            except Empty:
+                return count
+            store(k, future.result())  # raises the decode's error
+            count += 1
+
+    def report():
+        progress.pbar_set(prog=jackets_done, maximum=max(jackets_present, 1))
+
+    try:
+        with tracing.span("jacket atlas lookup"):
+            for song in songs:
+                total += 1
+                if song.jacket is None:
+                    continue
+                jackets_present += 1
+                fp = fingerprint(song.jacket)
+                img = cache.get(song.jacket, fp)
+                if img is not None:
+                    jacket_preview[song.id] = img
+                    jackets_done += 1
+                    continue
 
-    ListingTab.instance.refresh_jacket_previews()
-    progress.log(f"Found {jackets_present}/{len(metadata)} jackets.")
+                decoded[song.id] = (song.jacket, fp)
+                waiting.append(song.id)
+                if pool is None and workers > 1 and len(waiting) >= PROCESS_POOL_MIN:
+                    pool = ProcessPoolExecutor(workers, mp_context=get_context("spawn"))
+                if pool is not None:
+                    submit(waiting)
+                    waiting.clear()
+                    if store_finished(block=False) > 0:
+                        report()
+        report()
+
+        with tracing.span("jacket decodes", jackets=len(decoded)):
+            # too few to be worth starting worker processes
+            for k in waiting:
+                with tracing.span("jacket decode", path=decoded[k][0]):
+                    pixels = decode_thumbnail(decoded[k][0])
+                store(k, pixels)
+                report()
+            while jackets_done < jackets_present:
+                store_finished(block=True)
+                report()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        cache.close()
+
+    if len(decoded) > 0:
+        if cache.persistent:
+            # new thumbnails are read back from the atlas instead of kept in memory
+            cache = JacketCache(config.working_path)
+            for k, (path, fp) in decoded.items():
+                jacket_preview[k] = cache.get(path, fp)
+            cache.close()
+        progress.log(f"Created {len(decoded)} new jacket thumbnails.")
+
+    from ui.tabs.listing_tab import ListingTab
+
+    if ListingTab.instance is not None:
+        ListingTab.instance.md_panel.jackets.invalidate()
+    progress.log(f"Found {jackets_present}/{total} jackets.")
     progress.status_set(
-        TaskState.Alert if jackets_present < len(metadata) else TaskState.Complete
+        TaskState.Alert if jackets_present < total else TaskState.Complete
     )
 
 
+def load_jacket_preview(id: str) -> Image.Image | None:
+    """Preview of a song's jacket, decoding it if jackets haven't been scanned yet."""
+    img = jacket_preview.get(id)
+    if img is None and id in metadata and metadata[id].jacket is not None:
+        img = make_thumbnail(metadata[id].jacket)
+    return img
+
+
 def _populate_missing():
     missing_audio.clear()
     missing_jackets.clear()
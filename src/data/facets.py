@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterable
+
+from .metadata import SongMetadata
+
+DIFFICULTIES = 4
+
+
+def _bitset(positions: Iterable[int], size: int) -> int:
+    """Int with the bits at `positions` set, made in one pass."""
+    bits = bytearray((size + 7) // 8)
+    for p in positions:
+        bits[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(bits, "little")
+
+
+def _bitsets(values: dict, size: int) -> dict:
+    return {v: _bitset(positions, size) for v, positions in values.items()}
+
+
+class FacetIndex:
+    """Columnar index of songs for combining filters.
+
+    Each song is a bit position; every version, genre, designer and the
+    songs with videos have a bitset, and each difficulty's levels are a
+    sorted array with bitsets of the songs at or above each level, so a
+    level range is two binary searches. Filters resolve with bitwise and/or."""
+
+    def __init__(self, songs: Iterable[SongMetadata]):
+        self.ids: list[str] = []
+        """Song ID of each bit position"""
+        versions: dict[int, list[int]] = dict()
+        genres: dict[int, list[int]] = dict()
+        designers: dict[str, list[int]] = dict()
+        videos: list[int] = []
+        levels: list[dict[float, list[int]]] = [dict() for _ in range(DIFFICULTIES)]
+
+        for p, song in enumerate(songs):
+            self.ids.append(song.id)
+            versions.setdefault(song.version, []).append(p)
+            genres.setdefault(song.genre_id, []).append(p)
+            video = False
+            for d, diff in enumerate(song.difficulties):
+                if diff is None:
+                    continue
+                if diff.designer:
+                    designers.setdefault(diff.designer, []).append(p)
+                if diff.video is not None:
+                    video = True
+                if diff.diffLevel:
+                    levels[d].setdefault(float(diff.diffLevel), []).append(p)
+            if video:
+                videos.append(p)
+
+        size = len(self.ids)
+        self.all = _bitset(range(size), size)
+        self.versions: dict[int, int] = _bitsets(versions, size)
+        self.genres: dict[int, int] = _bitsets(genres, size)
+        self.designers: dict[str, int] = _bitsets(designers, size)
+        self.videos = _bitset(videos, size)
+
+        self.__levels: list[list[float]] = []
+        """Per difficulty, the levels its charts have in ascending order"""
+        self.__at_least: list[list[int]] = []
+        """Per difficulty, songs with a level of at least each of __levels"""
+        for charts in levels:
+            distinct = sorted(charts)
+            at_least = [0] * (len(distinct) + 1)
+            for i in range(len(distinct) - 1, -1, -1):
+                at_least[i] = at_least[i + 1] | _bitset(charts[distinct[i]], size)
+            self.__levels.append(distinct)
+            self.__at_least.append(at_least)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def levels(self, difficulty: int = None) -> list[float]:
+        """Levels the charts of a difficulty (any if None) have, ascending."""
+        if difficulty is None:
+            return sorted(set().union(*self.__levels))
+        return list(self.__levels[difficulty])
+
+    def level_range(
+        self, difficulty: int = None, min: float = None, max: float = None
+    ) -> int:
+        """Songs with a chart of a difficulty (any if None) with a level
+        between `min` and `max`, inclusive."""
+        if difficulty is None:
+            bits = 0
+            for d in range(DIFFICULTIES):
+                bits |= self.level_range(d, min, max)
+            return bits
+
+        levels = self.__levels[difficulty]
+        at_least = self.__at_least[difficulty]
+        lo = 0 if min is None else bisect_left(levels, min)
+        hi = len(levels) if max is None else bisect_right(levels, max)
+        return at_least[lo] & ~at_least[hi] if lo < hi else 0
+
+    def query(
+        self,
+        versions: Iterable[int] = None,
+        genres: Iterable[int] = None,
+        designers: Iterable[str] = None,
+        difficulty: int = None,
+        min_level: float = None,
+        max_level: float = None,
+        video: bool = None,
+    ) -> int:
+        """Songs matching every given filter, and any value within one."""
+        bits = self.all
+        for values, facet in (
+            (versions, self.versions),
+            (genres, self.genres),
+            (designers, self.designers),
+        ):
+            if values is not None:
+                matching = 0
+                for v in values:
+                    matching |= facet.get(v, 0)
+                bits &= matching
+        if difficulty is not None or min_level is not None or max_level is not None:
+            bits &= self.level_range(difficulty, min_level, max_level)
+        if video is not None:
+            bits &= self.videos if video else ~self.videos
+        return bits
+
+    def song_ids(self, bits: int) -> list[str]:
+        """IDs of the songs in a bitset, in index order."""
+        return [
+            self.ids[p] for p, bit in enumerate(reversed(bin(bits)[2:])) if bit == "1"
+        ]
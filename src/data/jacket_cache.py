@@ -0,0 +1,147 @@
+import mmap
+import os
+import tempfile
+
+from PIL import Image
+
+from .scan_index import Fingerprint, ScanIndex
+
+ATLAS_FILENAME = "jacket-thumbnails.bin"
+
+THUMBNAIL_SIZE = (200, 200)
+THUMBNAIL_MODE = "RGBA"
+"""RGBA so images can be made straight from the atlas without copying."""
+SLOT_SIZE = THUMBNAIL_SIZE[0] * THUMBNAIL_SIZE[1] * 4
+
+PROCESS_POOL_MIN = 8
+"""Fewest jackets to decode for which worker processes are worth starting."""
+
+_maps: dict[str, list[mmap.mmap]] = dict()
+"""Atlas path to the maps of it made so far, which images may still use"""
+
+
+def _unmap(path: str) -> bool:
+    """Close the maps of an atlas no image uses anymore; False if some are
+    still used. Windows can't truncate a file while it's mapped."""
+    used = [m for m in _maps.pop(path, []) if not _close_map(m)]
+    if len(used) > 0:
+        _maps[path] = used
+    return len(used) == 0
+
+
+def _close_map(m: mmap.mmap) -> bool:
+    try:
+        m.close()
+    except BufferError:
+        return False  # images made from it are still around
+    return True
+
+
+def decode_thumbnail(path: str) -> bytes:
+    """Decode and resize a jacket to preview size as raw pixels.
+
+    Uses the decoder's draft mode and integer reduction before the final
+    resize so big jackets are never resampled at full size. Runs in
+    worker processes, so it only depends on PIL."""
+    with Image.open(path) as img:
+        img.draft("RGB", THUMBNAIL_SIZE)  # only JPEG decoders support this
+        if img.mode not in ("RGB", "RGBA", "L", "LA"):
+            img = img.convert(THUMBNAIL_MODE)
+
+        factor = min(img.width // THUMBNAIL_SIZE[0], img.height // THUMBNAIL_SIZE[1])
+        if factor >= 2:
+            img = img.reduce(factor)
+        img = img.resize(THUMBNAIL_SIZE, Image.Resampling.BILINEAR)
+        return img.convert(THUMBNAIL_MODE).tobytes()
+
+
+def thumbnail_image(pixels: bytes) -> Image.Image:
+    """Image from the raw pixels made by decode_thumbnail."""
+    return Image.frombuffer(
+        THUMBNAIL_MODE, THUMBNAIL_SIZE, pixels, "raw", THUMBNAIL_MODE, 0, 1
+    )
+
+
+def make_thumbnail(path: str) -> Image.Image:
+    """Decode and resize a jacket to preview size."""
+    return thumbnail_image(decode_thumbnail(path))
+
+
+class JacketCache:
+    """Jacket thumbnails packed as raw pixels into fixed-size slots of one
+    file in the working folder, memory-mapped for reading.
+
+    Slots are tracked in the scan index by jacket path and fingerprint;
+    a changed jacket is rewritten in its slot, a new one is appended.
+    Like the scan index, the atlas falls back to a temporary file for
+    this run only if it can't be kept in the working folder."""
+
+    def __init__(self, working_path: str):
+        self.path = os.path.join(working_path, ATLAS_FILENAME)
+        self.__index = ScanIndex(working_path)
+        self.__slots = self.__index.load_jackets()
+        self.__updated: dict[str, tuple[int, int, int]] = dict()
+        self.error: str | None = self.__index.error
+        """Why thumbnails aren't kept in the working folder, if they aren't"""
+
+        if self.error is None:
+            try:
+                try:
+                    self.__atlas = open(self.path, "r+b")
+                except FileNotFoundError:
+                    self.__atlas = open(self.path, "w+b")
+            except OSError as e:
+                self.error = str(e)
+        if self.error is not None:
+            self.__atlas = tempfile.TemporaryFile()
+            self.__slots.clear()
+        # earlier scans' maps can only be closed once their images are gone
+        unmapped = _unmap(self.path)
+        if len(self.__slots) == 0 and unmapped:
+            self.__atlas.truncate(0)  # leftover from a discarded index
+
+        size = os.fstat(self.__atlas.fileno()).st_size
+        self.__next_slot = max(
+            [size // SLOT_SIZE] + [slot + 1 for _, _, slot in self.__slots.values()]
+        )
+        # images made from the map keep it alive after close()
+        self.__map = None
+        if size > 0:
+            self.__map = mmap.mmap(self.__atlas.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.persistent:
+                _maps.setdefault(self.path, []).append(self.__map)
+
+    @property
+    def persistent(self) -> bool:
+        """If thumbnails are kept in the working folder across runs."""
+        return self.error is None
+
+    def get(self, path: str, fp: Fingerprint) -> Image.Image | None:
+        """Thumbnail of a jacket if it was stored with the same fingerprint."""
+        entry = self.__slots.get(path)
+        if entry is None or entry[:2] != fp or self.__map is None:
+            return None
+
+        offset = entry[2] * SLOT_SIZE
+        if offset + SLOT_SIZE > len(self.__map):
+            return None
+        return thumbnail_image(memoryview(self.__map)[offset : offset + SLOT_SIZE])
+
+    def put(self, path: str, fp: Fingerprint, pixels: bytes):
+        """Store a thumbnail's raw pixels made by decode_thumbnail."""
+        if path in self.__slots:
+            slot = self.__slots[path][2]
+        else:
+            slot = self.__next_slot
+            self.__next_slot += 1
+
+        self.__atlas.seek(slot * SLOT_SIZE)
+        self.__atlas.write(pixels)
+        self.__slots[path] = self.__updated[path] = (*fp, slot)
+
+    def close(self):
+        """Write out new thumbnails and their slots."""
+        self.__atlas.close()
+        if self.persistent:
+            self.__index.store_jackets(self.__updated)
+        self.__index.close()
@@ -33,6 +33,12 @@ version_to_game = {
 game_to_version = {v: k for k, v in version_to_game.items()}
 
 
+def level_str(val: float) -> str:
+    """Level as shown in game, like 13+ for 13.7."""
+    fl = floor(val)
+    return f'{fl}{"+" if fl < val else ""}'
+
+
 @dataclass
 class Difficulty:
     audio_id: str
@@ -45,9 +51,7 @@ class Difficulty:
     diffLevel: str
 
     def diff_str(self):
-        val = float(self.diffLevel)
-        fl = floor(val)
-        return f'{fl}{"+" if fl < val else ""}'
+        return level_str(float(self.diffLevel))
 
 
 @dataclass
@@ -0,0 +1,249 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, TextIO
+
+## STREAMING JSON ##
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_DELIMITERS = ",:]} \t\n\r"
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+class _JsonReader:
+    """Pull-based JSON reader that only keeps a window of the file in memory."""
+
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, f: TextIO):
+        self.__f = f
+        self.__decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def __fill(self):
+        """Drop consumed text and read another chunk."""
+        chunk = self.__f.read(self.CHUNK_SIZE)
+        if chunk == "":
+            self.eof = True
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("unexpected end of JSON")
+            self.__fill()
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of `chars`."""
+        c = self.peek()
+        if c not in chars:
+            raise ValueError(f"expected one of {chars!r}, got {c!r}")
+        self.pos += 1
+        return c
+
+    def read_value(self) -> Any:
+        """Decode the next complete value."""
+        self.peek()
+        while True:
+            try:
+                val, end = self.__decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.__fill()
+                continue
+            # a scalar not followed by a delimiter may be cut off, e.g. a
+            # number decoded as 1 out of 1.25 split across chunks
+            if not self.eof and (
+                end == len(self.buf) or self.buf[end] not in _DELIMITERS
+            ):
+                self.__fill()
+                continue
+            self.pos = end
+            return val
+
+    def skip_value(self):
+        """Consume the next value without building it."""
+        if self.peek() not in '[{"':
+            self.read_value()  # scalars are small
+            return
+
+        depth = 0
+        while True:
+            m = _STRUCTURAL.search(self.buf, self.pos)
+            if m is None:
+                self.pos = len(self.buf)
+                if self.eof:
+                    raise ValueError("unexpected end of JSON")
+                self.__fill()
+                continue
+
+            c = m.group()
+            if c == '"':
+                self.pos = m.start()
+                tail = _STRING_TAIL.match(self.buf, self.pos + 1)
+                while tail is None:
+                    if self.eof:
+                        raise ValueError("unterminated JSON string")
+                    self.__fill()
+                    tail = _STRING_TAIL.match(self.buf, self.pos + 1)
+                self.pos = tail.end()
+            else:
+                self.pos = m.end()
+                depth += 1 if c in "[{" else -1
+
+            if depth == 0:
+                return
+
+    def enter_key(self, key: str):
+        """Advance into the value of `key` in the object starting here."""
+        self.expect("{")
+        if self.peek() == "}":
+            raise KeyError(key)
+        while True:
+            k = self.read_value()
+            self.expect(":")
+            if k == key:
+                return
+            self.skip_value()
+            if self.expect(",}") == "}":
+                raise KeyError(key)
+
+    def enter_index(self, index: int):
+        """Advance into element `index` of the array starting here."""
+        self.expect("[")
+        for _ in range(index):
+            if self.peek() == "]":
+                raise IndexError(index)
+            self.skip_value()
+            self.expect(",")
+        if self.peek() == "]":
+            raise IndexError(index)
+
+    def iter_array(self) -> Iterator[Any]:
+        """Decode the elements of the array starting here one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_value()
+            if self.expect(",]") == "]":
+                return
+
+
+def iter_table_rows(path: str) -> Iterator[dict]:
+    """Rows of `Exports[0].Table.Data` in a UAssetAPI JSON export, read one at a time."""
+    with open(path, "r", encoding="utf_8") as f:
+        reader = _JsonReader(f)
+        reader.enter_key("Exports")
+        reader.enter_index(0)
+        reader.enter_key("Table")
+        reader.enter_key("Data")
+        yield from reader.iter_array()
+
+
+## MusicParameterTable ROWS ##
+@dataclass
+class SongRow:
+    """Properties of a song as they appear in MusicParameterTable."""
+
+    id: str = None
+    genre: int = None
+    name: str = None
+    artist: str = None
+    rubi: str = None
+    copyright: str = None
+    tempo: str = None
+    version: int = None
+    audio_preview: float = None
+    audio_preview_len: float = None
+    jacket_path: str = None
+    background_video: list[str] = field(default_factory=lambda: [None] * 4)
+    levels: list[float] = field(default_factory=lambda: [None] * 4)
+    level_designer: list[str] = field(default_factory=lambda: [None] * 4)
+    level_clear_requirements: list[float] = field(default_factory=lambda: [None] * 4)
+
+
+def _round(v) -> float:
+    return round(float(v), 2)
+
+
+def _asset(v) -> str | None:
+    """Asset names use "-" or "" for none."""
+    return None if v in ("", "-") else v
+
+
+def _set(attr: str, conv: Callable[[Any], Any] = None):
+    def handler(row: SongRow, v):
+        setattr(row, attr, v if conv is None else conv(v))
+
+    return handler
+
+
+def _set_diff(attr: str, diff: int, conv: Callable[[Any], Any] = None):
+    def handler(row: SongRow, v):
+        getattr(row, attr)[diff] = v if conv is None else conv(v)
+
+    return handler
+
+
+PROPERTY_HANDLERS: dict[str, Callable[[SongRow, Any], None]] = {
+    "AssetDirectory": _set("id"),
+    # SongInfo
+    "ScoreGenre": _set("genre", int),
+    "MusicMessage": _set("name"),
+    "ArtistMessage": _set("artist"),
+    "Rubi": _set("rubi"),
+    "Bpm": _set("tempo"),
+    "CopyrightMessage": _set("copyright", _asset),
+    "VersionNo": _set("version"),
+    "JacketAssetName": _set("jacket_path"),
+    # ChartInfo Levels; "+0" = no chart
+    "DifficultyNormalLv": _set_diff("levels", 0, _round),
+    "DifficultyHardLv": _set_diff("levels", 1, _round),
+    "DifficultyExtremeLv": _set_diff("levels", 2, _round),
+    "DifficultyInfernoLv": _set_diff("levels", 3, _round),
+    # Audio Previews
+    "PreviewBeginTime": _set("audio_preview", _round),
+    "PreviewSeconds": _set("audio_preview_len", _round),
+    # Clear Requirements
+    "ClearNormaRateNormal": _set_diff("level_clear_requirements", 0, _round),
+    "ClearNormaRateHard": _set_diff("level_clear_requirements", 1, _round),
+    "ClearNormaRateExtreme": _set_diff("level_clear_requirements", 2, _round),
+    "ClearNormaRateInferno": _set_diff("level_clear_requirements", 3, _round),
+    # ChartInfo Designers
+    "NotesDesignerNormal": _set_diff("level_designer", 0),
+    "NotesDesignerHard": _set_diff("level_designer", 1),
+    "NotesDesignerExpert": _set_diff("level_designer", 2),
+    "NotesDesignerInferno": _set_diff("level_designer", 3),
+    # Video Backgrounds
+    "MovieAssetName": _set_diff("background_video", 0, _asset),
+    "MovieAssetNameHard": _set_diff("background_video", 1, _asset),
+    "MovieAssetNameExpert": _set_diff("background_video", 2, _asset),
+    "MovieAssetNameInferno": _set_diff("background_video", 3, _asset),
+}
+"""Property name to handler that converts its value into a SongRow."""
+
+
+def parse_song(row: dict) -> SongRow:
+    """Convert a MusicParameterTable row's properties into a SongRow."""
+    song = SongRow()
+    for prop in row["Value"]:
+        handler = PROPERTY_HANDLERS.get(prop["Name"])
+        if handler is not None:
+            handler(song, prop["Value"])
+    return song
+
+
+def iter_songs(path: str) -> Iterator[SongRow]:
+    """Songs of a MusicParameterTable export, parsed as they are read."""
+    for row in iter_table_rows(path):
+        yield parse_song(row)
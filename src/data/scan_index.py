@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+from dataclasses import asdict
+from typing import Callable, Iterable
+
+import tracing
+from .metadata import Difficulty, SongMetadata
+
+INDEX_FILENAME = "scan-index.sqlite3"
+
+SCHEMA_VERSION = 4
+"""Bump whenever the stored data or the way it is derived changes."""
+
+Fingerprint = tuple[int | None, int | None]
+"""(mtime_ns, size) of a path; (None, None) if the path doesn't exist."""
+
+
+def fingerprint(path: str) -> Fingerprint:
+    """Identity of a file or directory used to tell if it changed since the last scan."""
+    tracing.count("stat calls")
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (None, None)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _song_to_json(song: SongMetadata) -> str:
+    return json.dumps(asdict(song), ensure_ascii=False)
+
+
+def _song_from_json(data: str) -> SongMetadata:
+    d = json.loads(data)
+    d["difficulties"] = [
+        Difficulty(**diff) if diff is not None else None for diff in d["difficulties"]
+    ]
+    return SongMetadata(**d)
+
+
+class ScanIndex:
+    """Persistent results of a working folder scan, keyed by the
+    fingerprints of the files and directories they were built from.
+
+    If the index can't be opened in the working folder, like when it's
+    read-only, it is kept in memory for this run only; scans still work,
+    but nothing is reused next time. Callers should warn about it."""
+
+    def __init__(self, working_path: str):
+        self.path = os.path.join(working_path, INDEX_FILENAME)
+        self.error: str | None = None
+        """Why the index isn't kept in the working folder, if it isn't"""
+        try:
+            self.__db = sqlite3.connect(self.path, timeout=30)
+            self.__init_schema()
+        except sqlite3.Error as e:
+            self.error = str(e)
+            self.__db = sqlite3.connect(":memory:")
+            self.__init_schema()
+
+    @property
+    def persistent(self) -> bool:
+        """If results are kept in the working folder across runs."""
+        return self.error is None
+
+    def __init_schema(self):
+        # setup tasks open the index at the same time; only one may set it up
+        self.__db.execute("BEGIN IMMEDIATE")
+        with self.__db:
+            version = self.__db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                for table in (
+                    "sources",
+                    "songs",
+                    "song_sources",
+                    "audio",
+                    "jackets",
+                    "videos",
+                ):
+                    self.__db.execute(f"DROP TABLE IF EXISTS {table}")
+
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS sources"
+                " (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS songs"
+                " (id TEXT PRIMARY KEY, data TEXT, warnings TEXT)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS song_sources"
+                " (song_id TEXT, path TEXT, mtime_ns INTEGER, size INTEGER)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS audio (id TEXT PRIMARY KEY, path TEXT)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS jackets"
+                " (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, slot INTEGER)"
+            )
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS videos"
+                " (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, duration REAL,"
+                " source_mtime_ns INTEGER, source_size INTEGER)"
+            )
+            self.__db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self.__db.close()
+
+    ## SOURCES ##
+    def sources_fresh(self, paths: Iterable[str]) -> bool:
+        """If every path has the same fingerprint as when it was last stored."""
+        for path in paths:
+            row = self.__db.execute(
+                "SELECT mtime_ns, size FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None or tuple(row) != fingerprint(path):
+                return False
+        return True
+
+    def store_sources(self, paths: Iterable[str]):
+        with self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                [(p, *fingerprint(p)) for p in paths],
+            )
+
+    ## SONGS ##
+    def load_songs(self) -> tuple[dict[str, SongMetadata], set[str]]:
+        """Songs whose own source files haven't changed since they were stored,
+        and the IDs of the ones that have."""
+        stale: set[str] = set()
+        for song_id, path, mtime_ns, size in self.__db.execute(
+            "SELECT song_id, path, mtime_ns, size FROM song_sources"
+        ):
+            if song_id not in stale and (mtime_ns, size) != fingerprint(path):
+                stale.add(song_id)
+
+        fresh = {
+            id: _song_from_json(data)
+            for id, data in self.__db.execute("SELECT id, data FROM songs ORDER BY id")
+            if id not in stale
+        }
+        return fresh, stale
+
+    def load_song_warnings(self) -> dict[str, list[str]]:
+        """Song ID to the warnings logged when it was scanned, for songs with any."""
+        return {
+            id: json.loads(warnings)
+            for id, warnings in self.__db.execute(
+                "SELECT id, warnings FROM songs WHERE warnings != '[]'"
+            )
+        }
+
+    def store_songs(
+        self,
+        songs: dict[str, SongMetadata],
+        song_sources: dict[str, list[str]],
+        fingerprint: Callable[[str], Fingerprint] = fingerprint,
+        warnings: dict[str, list[str]] = None,
+    ):
+        """Add or replace songs. `song_sources` maps song ID to the paths it
+        was built from, and `warnings` to the warnings logged scanning it."""
+        warnings = warnings or dict()
+        with self.__db:
+            self.__db.executemany(
+                "DELETE FROM song_sources WHERE song_id = ?", [(id,) for id in songs]
+            )
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO songs VALUES (?, ?, ?)",
+                [
+                    (id, _song_to_json(song), json.dumps(warnings.get(id, [])))
+                    for id, song in songs.items()
+                ],
+            )
+            self.__db.executemany(
+                "INSERT INTO song_sources VALUES (?, ?, ?, ?)",
+                [
+                    (id, p, *fingerprint(p))
+                    for id, paths in song_sources.items()
+                    for p in paths
+                ],
+            )
+
+    def retain_songs(self, ids: Iterable[str]):
+        """Drop every stored song not in `ids`."""
+        ids = set(ids)
+        removed = [
+            (id,)
+            for (id,) in self.__db.execute("SELECT id FROM songs")
+            if id not in ids
+        ]
+        with self.__db:
+            self.__db.executemany("DELETE FROM songs WHERE id = ?", removed)
+            self.__db.executemany("DELETE FROM song_sources WHERE song_id = ?", removed)
+
+    ## AUDIO ##
+    def load_audio(self) -> dict[str, str]:
+        return dict(self.__db.execute("SELECT id, path FROM audio"))
+
+    def store_audio(self, audio: dict[str, str]):
+        with self.__db:
+            self.__db.execute("DELETE FROM audio")
+            self.__db.executemany("INSERT INTO audio VALUES (?, ?)", audio.items())
+
+    ## JACKET THUMBNAILS ##
+    def load_jackets(self) -> dict[str, tuple[int, int, int]]:
+        """Jacket path to its (mtime_ns, size) when thumbnailed and its atlas slot."""
+        return {
+            path: (mtime_ns, size, slot)
+            for path, mtime_ns, size, slot in self.__db.execute(
+                "SELECT path, mtime_ns, size, slot FROM jackets"
+            )
+        }
+
+    def store_jackets(self, jackets: dict[str, tuple[int, int, int]]):
+        """Add or replace jacket thumbnail slots."""
+        with self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO jackets VALUES (?, ?, ?, ?)",
+                [(path, *entry) for path, entry in jackets.items()],
+            )
+
+    ## CONVERTED VIDEOS ##
+    def load_videos(self) -> dict[str, tuple[int, int, float, int, int]]:
+        """Converted video path to its (mtime_ns, size) when probed, its
+        duration, and the (mtime_ns, size) of the source it was checked against."""
+        return {
+            path: (mtime_ns, size, duration, source_mtime_ns, source_size)
+            for (
+                path,
+                mtime_ns,
+                size,
+                duration,
+                source_mtime_ns,
+                source_size,
+            ) in self.__db.execute(
+                "SELECT path, mtime_ns, size, duration, source_mtime_ns, source_size"
+                " FROM videos"
+            )
+        }
+
+    def store_videos(self, videos: dict[str, tuple[int, int, float, int, int]]):
+        """Add or replace probed videos."""
+        with self.__db:
+            self.__db.executemany(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, *entry) for path, entry in videos.items()],
+            )
@@ -0,0 +1,67 @@
+import unicodedata
+from typing import Iterable
+
+from .metadata import SongMetadata
+
+_KATAKANA_TO_HIRAGANA = {c: c - 0x60 for c in range(0x30A1, 0x30F7)}
+
+
+def normalize(text: str) -> str:
+    """Fold text for searching: width (NFKC), case, katakana to hiragana,
+    and no whitespace."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(text.translate(_KATAKANA_TO_HIRAGANA).split())
+
+
+def _bigrams(text: str) -> set[str]:
+    return set(map(str.__add__, text, text[1:]))
+
+
+class SearchIndex:
+    """Substring search over songs' names, artists and rubi.
+
+    Songs are found through an index of the characters and bigrams of
+    their normalized text. Typing more of a query only narrows the
+    previous results down, without going back to the index."""
+
+    def __init__(self, songs: Iterable[SongMetadata]):
+        self.__texts: dict[str, str] = dict()
+        """ID to normalized fields, one per line so grams don't span fields"""
+        self.__grams: dict[str, set[str]] = dict()
+        """Character or bigram to IDs of songs containing it"""
+        self.__last: tuple[str, set[str]] = None
+        """Last normalized query and its results"""
+
+        grams = self.__grams
+        for song in songs:
+            fields = [normalize(f) for f in (song.name, song.artist, song.rubi) if f]
+            text = self.__texts[song.id] = "\n".join(fields)
+            song_grams = set(text)
+            for field in fields:
+                song_grams.update(_bigrams(field))
+            song_grams.discard("\n")
+            for gram in song_grams:
+                if gram in grams:
+                    grams[gram].add(song.id)
+                else:
+                    grams[gram] = {song.id}
+
+    def search(self, query: str) -> set[str] | None:
+        """IDs of songs matching a query; None if the query is empty."""
+        query = normalize(query)
+        if query == "":
+            self.__last = None
+            return None
+
+        if self.__last is not None and self.__last[0] in query:
+            # narrowing down the last query
+            candidates = self.__last[1]
+        else:
+            grams = _bigrams(query) if len(query) > 1 else {query}
+            sets = sorted((self.__grams.get(g, set()) for g in grams), key=len)
+            candidates = sets[0].intersection(*sets[1:])
+
+        # bigrams match in any order, so check they make up the query
+        results = {id for id in candidates if query in self.__texts[id]}
+        self.__last = (query, results)
+        return results
@@ -0,0 +1,84 @@
+import os
+
+import tracing
+
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+
+class DirSnapshot:
+    """Everything under a directory, listed once with os.scandir.
+
+    Existence checks and listings are answered from memory instead of
+    making a filesystem round-trip per path."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.__files: dict[str, tuple[str, int, int]] = dict()
+        """Path key to file path, mtime_ns and size"""
+        self.__dirs: dict[str, list[str]] = dict()
+        """Path key to names of its entries, in listing order"""
+        self.__dir_stats: dict[str, tuple[int, int]] = dict()
+        """Path key to mtime_ns and size of subdirectories"""
+
+        with tracing.span("directory snapshot", root=root):
+            self.__scan(root)
+        tracing.count("stat calls", len(self.__files) + len(self.__dir_stats))
+
+    def __scan(self, root: str):
+        stack = [root]
+        while len(stack) > 0:
+            path = stack.pop()
+            try:
+                entries = list(os.scandir(path))
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+
+            names = self.__dirs[_key(path)] = []
+            for e in entries:
+                try:
+                    st = e.stat()
+                    is_dir = e.is_dir()
+                except OSError:
+                    continue  # broken symlink, or removed since listing
+                names.append(e.name)
+                if is_dir:
+                    stack.append(e.path)
+                    self.__dir_stats[_key(e.path)] = (st.st_mtime_ns, st.st_size)
+                else:
+                    self.__files[_key(e.path)] = (e.path, st.st_mtime_ns, st.st_size)
+
+    def __len__(self):
+        return len(self.__files)
+
+    def exists(self, path: str) -> bool:
+        k = _key(path)
+        return k in self.__files or k in self.__dirs
+
+    def isdir(self, path: str) -> bool:
+        return _key(path) in self.__dirs
+
+    def isfile(self, path: str) -> bool:
+        return _key(path) in self.__files
+
+    def size(self, path: str) -> int | None:
+        f = self.__files.get(_key(path))
+        return f[2] if f is not None else None
+
+    def fingerprint(self, path: str) -> tuple[int | None, int | None] | None:
+        """(mtime_ns, size) of a path under the snapshot root, like
+        scan_index.fingerprint; None if the path is outside of it."""
+        k = _key(path)
+        if not k.startswith(_key(self.root) + os.sep):
+            return None
+        if k in self.__files:
+            return self.__files[k][1:]
+        return self.__dir_stats.get(k, (None, None))
+
+    def listdir(self, path: str) -> list[str]:
+        return self.__dirs.get(_key(path), [])
+
+    def files(self) -> list[str]:
+        """Paths of all files."""
+        return [f[0] for f in self.__files.values()]
@@ -0,0 +1,27 @@
+from enum import Enum
+
+
+class TaskState(Enum):
+    InProgress = 0
+    Complete = 1
+    Alert = 2
+    Error = 3
+
+
+class ConsoleProgress:
+    """Stand-in for ui.data_setup.TaskProgress that prints to the console."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = TaskState.InProgress
+
+    def status_set(self, status: TaskState):
+        self.state = status
+
+    def pbar_set(
+        self, step: int = None, prog: int = None, maximum: int = None, stop_anim=False
+    ):
+        pass
+
+    def log(self, msg):
+        print(f"[{self.name}] {msg}")
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING
+
+import ffmpeg
+
+import config
+from util import default_ffmpeg_jobs, ffmpeg_on_path
+from .scan_index import ScanIndex, fingerprint
+from .task import TaskState
+
+if TYPE_CHECKING:
+    from ui.data_setup import TaskProgress
+
+
+def probe_duration(path: str, **kwargs) -> float | None:
+    """Duration of a video in seconds; None if it can't be read, like a
+    conversion that was cut off before it could be finalized. Extra
+    arguments are passed to ffprobe."""
+    try:
+        probe = ffmpeg.probe(path, **kwargs)
+    except ffmpeg.Error:
+        return None
+    durations = [probe.get("format", dict()).get("duration")]
+    durations += [s.get("duration") for s in probe.get("streams", [])]
+    for duration in durations:
+        try:
+            duration = float(duration)
+        except (TypeError, ValueError):
+            continue
+        if duration > 0:
+            return duration
+    return None
+
+
+def probe_source_duration(path: str) -> float | None:
+    """Duration of a game .usm video in seconds; None if ffprobe can't tell."""
+    return probe_duration(path, f="mpegvideo")
+
+
+def durations_match(output: float, source: float | None) -> bool:
+    """If a converted video is as long as its source, give or take a second
+    or 2% (ffprobe can only estimate the length of a .usm). True if the
+    source's length isn't known."""
+    if source is None:
+        return True
+    return abs(output - source) <= max(1.0, source * 0.02)
+
+
+def convert_video(src: str, dest: str, threads: int) -> float:
+    """Convert a game .usm video to mp4, renaming it into place when done.
+    Returns the converted video's duration."""
+    head, name = os.path.split(dest)
+    tmp = os.path.join(head, f".{os.path.splitext(name)[0]}.partial.mp4")
+    ffmpeg.input(src, f="mpegvideo").output(
+        tmp, threads=threads, loglevel="error"
+    ).overwrite_output().run(quiet=True)
+    duration = probe_duration(tmp)
+    if duration is None:
+        os.remove(tmp)
+        raise ValueError("ffmpeg made an unreadable video")
+    os.replace(tmp, dest)
+    return duration
+
+
+def convert_videos(progress: TaskProgress, jobs: int = None):
+    """Convert the .usm videos in config.video_source_path into the
+    working folder's movies folder, running `jobs` conversions at once.
+
+    Videos that were already converted are skipped if they can be read and
+    are as long as their source; cut off ones are converted again."""
+    source_dir = config.video_source_path
+    videos_dir = os.path.join(config.working_path, "movies")
+    if source_dir == "" or not os.path.isdir(source_dir):
+        progress.log(f"Video source folder not found ({source_dir}); skipping.")
+        progress.pbar_set(prog=0, maximum=1)
+        progress.status_set(TaskState.Alert)
+        return
+    if not ffmpeg_on_path():
+        progress.log("ffmpeg not found on PATH; can't convert videos.")
+        progress.pbar_set(prog=0, maximum=1)
+        progress.status_set(TaskState.Error)
+        return
+
+    jobs = jobs or default_ffmpeg_jobs()
+    threads = max(1, (os.cpu_count() or 1) // jobs)
+    os.makedirs(videos_dir, exist_ok=True)
+    sources = sorted(
+        e.path
+        for e in os.scandir(source_dir)
+        if e.is_file() and e.name.lower().endswith(".usm")
+    )
+    progress.log(f"Found {len(sources)} videos in {source_dir}.")
+    progress.pbar_set(prog=0, maximum=max(1, len(sources)))
+
+    index = ScanIndex(config.working_path)
+    if not index.persistent:
+        progress.log(f"WARNING: Could not open scan index at {index.path}!")
+        progress.log(f"    {index.error}")
+        progress.log("    Every run will probe the converted videos again.")
+    probed = index.load_videos()
+    valid: dict[str, tuple[int, int, float, int, int]] = dict()
+    converted = 0
+    failed = 0
+
+    def is_done(src: str, dest: str) -> bool:
+        fp = fingerprint(dest)
+        if fp == (None, None):
+            return False
+        src_fp = fingerprint(src)
+        if dest in probed and probed[dest][:2] == fp and probed[dest][3:] == src_fp:
+            return True
+        duration = probe_duration(dest)
+        if duration is None:
+            return False
+        if not durations_match(duration, probe_source_duration(src)):
+            # readable, but cut off, like an interrupted convert-videos.bat
+            return False
+        valid[dest] = (*fp, duration, *src_fp)
+        return True
+
+    def convert(src: str, dest: str) -> bool:
+        """Whether it had to be converted."""
+        if is_done(src, dest):
+            return False
+        duration = convert_video(src, dest, threads)
+        valid[dest] = (*fingerprint(dest), duration, *fingerprint(src))
+        return True
+
+    with ThreadPoolExecutor(jobs, thread_name_prefix="video") as pool:
+        futures = {
+            pool.submit(
+                convert,
+                src,
+                os.path.join(
+                    videos_dir, f"{os.path.splitext(os.path.basename(src))[0]}.mp4"
+                ),
+            ): src
+            for src in sources
+        }
+        for done, f in enumerate(as_completed(futures), start=1):
+            src = futures[f]
+            try:
+                if f.result():
+                    converted += 1
+                    progress.log(f"Converted {os.path.basename(src)}.")
+            except Exception as e:
+                failed += 1
+                progress.log(f"WARNING: Could not convert {os.path.basename(src)}!")
+                progress.log(f"    {e}")
+            progress.pbar_set(prog=done)
+
+    index.store_videos(valid)
+    index.close()
+
+    progress.log(
+        f"Converted {converted} videos; {len(sources) - converted - failed}"
+        f" were already done and {failed} failed."
+    )
+    progress.status_set(TaskState.Alert if failed > 0 else TaskState.Complete)
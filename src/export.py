@@ -1,7 +1,13 @@
+import hashlib
 import os
-from queue import Empty, Queue
 import shutil
-from pathlib import Path
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from queue import Empty, Queue
+from threading import Lock
 
 import ffmpeg
 
@@ -10,6 +16,287 @@ from util import *
 import config
 from data.database import *
 from data.metadata import *
+from archive import ArchiveWriter
+from data.scan_index import Fingerprint, fingerprint
+from export_manifest import ExportManifest, is_partial, partial_path
+from transcode_cache import DEFAULT_MAX_BYTES, TranscodeCache
+from transfer import DEFAULT_STRATEGIES, transfer
+
+COPY_PARAMS = "copy"
+TEXT_PARAMS = "text"
+
+
+@dataclass(frozen=True)
+class ExportOptions:
+    """Everything export_song needs to know besides the song."""
+
+    output_path: str
+    audio_target: str | None = None
+    """Audio extension to convert WAVs to with ffmpeg; None to copy WAVs."""
+    game_subfolders: bool = False
+    exclude_videos: bool = False
+    delete_originals: bool = False
+    workers: int = 4
+    """Songs exported at once, and size of the file copy pool."""
+    encoders: int = default_ffmpeg_jobs()
+    """Size of the ffmpeg encode pool."""
+    transfer: tuple[str, ...] = DEFAULT_STRATEGIES
+    """Order of transfer strategies to try for copying audio, videos and jackets."""
+    transcode_cache: str | None = None
+    """Folder to keep converted audio in for later exports; None to not keep it."""
+    transcode_cache_bytes: int = DEFAULT_MAX_BYTES
+    archive: str | None = None
+    """Zip or tar file to write instead of a folder, or "-" for stdout."""
+    archive_format: str = "zip"
+
+    @property
+    def audio_ext(self) -> str:
+        return self.audio_target if self.audio_target is not None else "wav"
+
+    @property
+    def encoder_threads(self) -> int:
+        """ffmpeg -threads per encode, so all encoders together use about every core."""
+        return max(1, (os.cpu_count() or 1) // max(1, self.encoders))
+
+
+class ExportPools:
+    """Separately sized pools for the heavy parts of exporting songs.
+
+    Copies are I/O-bound and ffmpeg encodes CPU-bound, so running both
+    on the same threads either oversubscribes the CPU or idles the disk."""
+
+    def __init__(self, options: ExportOptions):
+        self.copy = ThreadPoolExecutor(options.workers, thread_name_prefix="copy")
+        self.encode = ThreadPoolExecutor(options.encoders, thread_name_prefix="encode")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.shutdown()
+
+    def shutdown(self, cancel=False):
+        self.copy.shutdown(cancel_futures=cancel)
+        self.encode.shutdown(cancel_futures=cancel)
+
+
+def open_transcode_cache(options: ExportOptions) -> TranscodeCache | None:
+    """The options' transcode cache, if they convert audio and have one."""
+    if options.audio_target is None or options.transcode_cache is None:
+        return None
+    try:
+        return TranscodeCache(
+            options.transcode_cache, options.transcode_cache_bytes, options.transfer
+        )
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not open transcode cache at {options.transcode_cache} ({e}).")
+        return None
+
+
+def _encode_params(dest: str, bitrate: str) -> str:
+    return f"{os.path.splitext(dest)[1]}:{bitrate}"
+
+
+class DestDir:
+    """Files in an export folder, listed once when first written to and
+    kept up to date as files are written, so checking outputs doesn't
+    stat each one. Names are looked up case-insensitively.
+
+    Temporary files from before `started` (time.time_ns()), left by an
+    interrupted export, are removed when listing."""
+
+    def __init__(self, path: str, started: int):
+        self.path = path
+        self.__files: dict[str, Fingerprint] = dict()
+        """Casefolded name to fingerprint"""
+        try:
+            with os.scandir(path) as entries:
+                for e in entries:
+                    if not e.is_file():
+                        continue
+                    st = e.stat()
+                    if is_partial(e.name):
+                        if st.st_mtime_ns < started:
+                            try:
+                                os.remove(e.path)
+                            except OSError:
+                                pass  # replaced if the same file is written again
+                        continue
+                    self.__files[e.name.casefold()] = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            os.makedirs(path, exist_ok=True)
+
+    def fingerprint(self, name: str) -> Fingerprint:
+        return self.__files.get(name.casefold(), (None, None))
+
+    def update(self, name: str, fp: Fingerprint):
+        self.__files[name.casefold()] = fp
+
+
+class FolderOutput:
+    """Writes exported files into the export folder, skipping the ones
+    its manifest has as done. Files are written under temporary names
+    and renamed into place."""
+
+    def __init__(self, options: ExportOptions, pools: ExportPools):
+        self.options = options
+        self.pools = pools
+        self.manifest = ExportManifest(options.output_path)
+        self.__started = time.time_ns()
+        self.__dirs: dict[str, DestDir] = dict()
+        self.__dirs_lock = Lock()
+
+    def close(self):
+        self.manifest.close()
+
+    def __dest(self, rel: str) -> tuple[str, DestDir, str]:
+        """Path of an output, its folder and its name in the folder."""
+        dest = os.path.join(self.options.output_path, rel)
+        head, name = os.path.split(dest)
+        dir = self.__dirs.get(head)
+        if dir is None:
+            # listed outside the lock, so workers don't wait on each other's
+            # folders; if two list the same one, only the first is kept
+            listed = DestDir(head, self.__started)
+            with self.__dirs_lock:
+                dir = self.__dirs.setdefault(head, listed)
+        return dest, dir, name
+
+    def __record(self, dest: str, dir: DestDir, name: str, *args):
+        dir.update(name, self.manifest.record(dest, *args))
+
+    def write_text(self, rel: str, text: str, src: str = None) -> Future | None:
+        """Write a generated file unless it's already there with the same contents."""
+        dest, dir, name = self.__dest(rel)
+        data = text.encode("utf-8")
+        digest = hashlib.sha1(data).hexdigest()
+        if self.manifest.is_done(
+            dest, src, TEXT_PARAMS, digest, dest_fp=dir.fingerprint(name)
+        ):
+            return None
+
+        src_fp = fingerprint(src) if src is not None else (None, None)
+        tmp = partial_path(dest)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dest)
+        self.__record(dest, dir, name, src, src_fp, TEXT_PARAMS, digest)
+        return None
+
+    def copy(self, src: str, rel: str) -> Future | None:
+        dest, dir, name = self.__dest(rel)
+        if self.manifest.is_done(dest, src, COPY_PARAMS, dest_fp=dir.fingerprint(name)):
+            return None
+        return self.pools.copy.submit(self.__copy, src, dest, dir, name)
+
+    def __copy(self, src: str, dest: str, dir: DestDir, name: str):
+        src_fp = fingerprint(src)
+        tmp = partial_path(dest)
+        transfer(src, tmp, self.options.transfer, move=self.options.delete_originals)
+        os.replace(tmp, dest)
+        self.__record(dest, dir, name, src, src_fp, COPY_PARAMS)
+
+    def is_done(self, src: str, rel: str, params: str) -> bool:
+        dest, dir, name = self.__dest(rel)
+        return self.manifest.is_done(dest, src, params, dest_fp=dir.fingerprint(name))
+
+    def encode_path(self, rel: str) -> str:
+        """Where to have ffmpeg write a file to add with add_encoded."""
+        return partial_path(self.__dest(rel)[0])
+
+    def add_encoded(self, path: str, rel: str, src: str, src_fp, params: str):
+        dest, dir, name = self.__dest(rel)
+        os.replace(path, dest)
+        self.__record(dest, dir, name, src, src_fp, params)
+
+
+_COMPRESSED_EXTENSIONS = {".mp3", ".ogg", ".mp4", ".m4a", ".webm", ".png", ".jpg"}
+"""Files already compressed, which deflating would only slow down."""
+
+
+def _arcname(rel: str) -> str:
+    return rel.replace(os.sep, "/")
+
+
+def _compress(rel: str) -> bool:
+    return os.path.splitext(rel)[1].lower() not in _COMPRESSED_EXTENSIONS
+
+
+class ArchiveOutput:
+    """Streams exported files into one zip or tar archive.
+
+    Zip entries are deflated, except for already compressed files like
+    MP3, OGG and MP4, which are stored; WAV audio is raw PCM, so it's
+    deflated. Tar entries are always stored."""
+
+    def __init__(self, options: ExportOptions, pools: ExportPools):
+        self.options = options
+        self.writer = ArchiveWriter(options.archive, options.archive_format)
+        self.__tmp = tempfile.mkdtemp(prefix="wack-export-")
+
+    def close(self):
+        try:
+            self.writer.close()
+        finally:
+            shutil.rmtree(self.__tmp, ignore_errors=True)
+
+    def write_text(self, rel: str, text: str, src: str = None) -> Future:
+        return self.writer.add_bytes(_arcname(rel), text.encode("utf-8"), compress=True)
+
+    def copy(self, src: str, rel: str) -> Future:
+        return self.writer.add_file(
+            _arcname(rel),
+            src,
+            compress=_compress(rel),
+            remove=self.options.delete_originals,
+        )
+
+    def is_done(self, src: str, rel: str, params: str) -> bool:
+        return False
+
+    def encode_path(self, rel: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(rel)[1], dir=self.__tmp)
+        os.close(fd)
+        return path
+
+    def add_encoded(self, path: str, rel: str, src: str, src_fp, params: str):
+        self.writer.add_file(
+            _arcname(rel), path, compress=_compress(rel), remove=True
+        ).result()
+
+
+ExportOutput = FolderOutput | ArchiveOutput
+
+
+def open_output(options: ExportOptions, pools: ExportPools) -> ExportOutput:
+    if options.archive is not None:
+        return ArchiveOutput(options, pools)
+    return FolderOutput(options, pools)
+
+
+def _encode(
+    output: ExportOutput,
+    cache: TranscodeCache | None,
+    src: str,
+    rel: str,
+    bitrate: str,
+    threads: int,
+    delete_src: bool,
+):
+    src_fp = fingerprint(src)
+    params = _encode_params(rel, bitrate)
+    tmp = output.encode_path(rel)
+    key = TranscodeCache.key(src, src_fp, params)
+    if cache is None or not cache.fetch(key, tmp):
+        print(f"Converting {os.path.basename(src)} to {rel}...")
+        ffmpeg.input(src).output(
+            tmp, audio_bitrate=bitrate, threads=threads, loglevel="warning"
+        ).overwrite_output().run()
+        if cache is not None:
+            cache.store(key, tmp)
+    output.add_encoded(tmp, rel, src, src_fp, params)
+    if delete_src:
+        os.remove(src)
 
 
 def meta_mer(song: SongMetadata) -> str:
@@ -46,97 +333,123 @@ def diff_mer(mer: str, diff: Difficulty, audio_ext: str) -> str:
     return pre + "#--- END WACK TAGS ---\n" + mer
 
 
-def export_song(song: SongMetadata):
-    """Export a song to configured export path."""
+@dataclass(frozen=True)
+class SongResult:
+    """Outcome of exporting a song, as reported back to whoever started it."""
+
+    id: str
+    alerts: tuple[str, ...] = ()
+    error: str | None = None
+
+    @property
+    def status(self) -> str:
+        """"error", "alert" or "success"."""
+        if self.error is not None:
+            return "error"
+        return "alert" if len(self.alerts) > 0 else "success"
+
+
+def export_song(
+    song: SongMetadata,
+    options: ExportOptions,
+    pools: ExportPools,
+    output: ExportOutput,
+    cache: TranscodeCache = None,
+) -> list[str]:
+    """Export a song to `output`.
+
+    Copies and encodes run on `pools`, reusing conversions from `cache`.
+    Returns once they're all done."""
     from data.database import audio_file
-    from ui.tabs.export_tab import ExportTab
 
     alerts = []
+    jobs: list[Future] = []
 
-    out = config.export_path
-    if ExportTab.instance.option_game_subfolders.get():
-        out = os.path.join(out, version_to_game[song.version])
+    def add(job: Future | None):
+        if job is not None:
+            jobs.append(job)
 
-    # desired audio extension from UI
-    audio_ext = (
-        ExportTab.instance.combobox_audio_conv_target.get()
-        if ExportTab.instance.option_convert_audio.get()
-        else "wav"
-    )
+    # song folder, relative to the export root
+    song_dir = sanitize_song(f"{song.artist} - {song.name}")
+    if options.game_subfolders:
+        song_dir = os.path.join(version_to_game[song.version], song_dir)
 
-    # create song folder
-    song_path = os.path.join(out, sanitize_song(f"{song.artist} - {song.name}"))
-    if not os.path.exists(song_path):
-        Path(song_path).mkdir(parents=True, exist_ok=True)
+    audio_ext = options.audio_ext
 
     # create meta.mer
-    meta = meta_mer(song)
-    meta_path = os.path.join(song_path, "meta.mer")
-    with open(meta_path, "w", encoding="utf-8") as f:
-        f.write(meta)
+    add(output.write_text(os.path.join(song_dir, "meta.mer"), meta_mer(song)))
+
+    # outputs already submitted; difficulties often share audio and videos
+    submitted: set[str] = set()
+
+    def copy(src: str, name: str):
+        rel = os.path.join(song_dir, name)
+        if rel not in submitted:
+            submitted.add(rel)
+            add(output.copy(src, rel))
 
     # copy jacket
-    src_jacket = os.path.join(song_path, "jacket.png")
-    shutil.copy2(song.jacket, src_jacket)
-    if ExportTab.instance.option_delete_originals.get():
-        os.remove(src_jacket)
+    if song.jacket is not None:
+        copy(song.jacket, "jacket.png")
+    else:
+        alerts.append("Jacket not found")
 
     # per-difficulty operations
     for i, diff in enumerate(song.difficulties):
         if diff == None:
             continue
 
-        # copy/convert audio named after song id if file doesn't exist
+        # copy/convert audio named after song id
         try:
             a_id = diff.audio_id
             src = audio_file[a_id]
-            dest_regex = f"{a_id}.{audio_ext}$"
-            if not file_exists(song_path, dest_regex):
-                if audio_ext == "wav":
-                    dest = os.path.join(song_path, f"{a_id}.wav")
-                    shutil.copy2(src, dest)
-                    if ExportTab.instance.option_delete_originals.get():
-                        os.remove(src)
-                else:
-                    dest = os.path.join(song_path, f"{a_id}.{audio_ext}")
-                    if audio_ext == "mp3":
-                        print(f"Converting {a_id} to MP3...")
-                        ffmpeg.input(src).output(
-                            dest, audio_bitrate="320k", loglevel="warning"
-                        ).run()
-                    else:
-                        ffmpeg.input(src).output(
-                            dest, audio_bitrate="192k", loglevel="warning"
-                        ).run()
-
-                    if ExportTab.instance.option_delete_originals.get():
-                        os.remove(src)
+            if audio_ext == "wav":
+                copy(src, f"{a_id}.wav")
+            else:
+                rel = os.path.join(song_dir, f"{a_id}.{audio_ext}")
+                bitrate = "320k" if audio_ext == "mp3" else "192k"
+                params = _encode_params(rel, bitrate)
+                if rel not in submitted and not output.is_done(src, rel, params):
+                    submitted.add(rel)
+                    jobs.append(
+                        pools.encode.submit(
+                            _encode,
+                            output,
+                            cache,
+                            src,
+                            rel,
+                            bitrate,
+                            options.encoder_threads,
+                            options.delete_originals,
+                        )
+                    )
         except KeyError:
             alerts.append(f"Audio file not found for {DifficultyName(i).name}")
 
         # copy video file
-        if diff.video != None and not ExportTab.instance.option_exclude_videos.get():
-            dest = os.path.join(song_path, os.path.basename(diff.video))
-            if not os.path.exists(dest):
-                shutil.copy2(diff.video, dest)
-                if ExportTab.instance.option_delete_originals.get():
-                    os.remove(diff.video)
+        if diff.video != None and not options.exclude_videos:
+            copy(diff.video, os.path.basename(diff.video))
 
         # copy chart file with WacK-specific meta tags
         src = os.path.join(
             config.working_path, "MusicData", song.id, f"{song.id}_0{i}.mer"
         )
-        dest = os.path.join(song_path, f"{i}.mer")
 
         with open(src, "r", encoding="utf-8") as f:
             mer = f.read()
 
-        out = diff_mer(mer, diff, audio_ext)
-
-        with open(dest, "w", encoding="utf-8") as f:
-            f.write(out)
+        add(
+            output.write_text(
+                os.path.join(song_dir, f"{i}.mer"), diff_mer(mer, diff, audio_ext), src
+            )
+        )
 
-        # if ExportTab.instance.option_delete_originals.get():
+        # if options.delete_originals:
         #     os.remove(src)
 
+    # raise the first failed job's error
+    wait(jobs)
+    for job in jobs:
+        job.result()
+
     return alerts
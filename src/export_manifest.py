@@ -0,0 +1,132 @@
+import os
+import sqlite3
+from threading import Lock
+
+from data.scan_index import Fingerprint, fingerprint
+
+MANIFEST_FILENAME = "wack-export-manifest.sqlite3"
+
+SCHEMA_VERSION = 1
+"""Bump whenever the stored data or the way outputs are made changes."""
+
+
+def partial_path(dest: str) -> str:
+    """Temporary name to write `dest` to before renaming it into place.
+
+    Keeps the extension so ffmpeg still picks the right format."""
+    head, name = os.path.split(dest)
+    root, ext = os.path.splitext(name)
+    return os.path.join(head, f".{root}.partial{ext}")
+
+
+def is_partial(name: str) -> bool:
+    """If a file name was made by partial_path."""
+    root, ext = os.path.splitext(name)
+    return name.startswith(".") and (root.endswith(".partial") or ext == ".partial")
+
+
+class ExportManifest:
+    """Record of the files written to an export folder, kept in the folder.
+
+    Per output file it stores the source it was made from, the
+    parameters used to make it and the output's own fingerprint, so a
+    later export can skip files that are already done and intact.
+    Outputs are only recorded once they have been renamed into place.
+
+    Safe to use from several threads."""
+
+    def __init__(self, export_path: str):
+        self.root = export_path
+        self.path = os.path.join(export_path, MANIFEST_FILENAME)
+        self.__lock = Lock()
+        try:
+            os.makedirs(export_path, exist_ok=True)
+            self.__db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.__init_schema()
+        except (OSError, sqlite3.Error) as e:
+            print(
+                f"Could not open export manifest at {self.path} ({e}); not persisting."
+            )
+            self.__db = sqlite3.connect(":memory:", check_same_thread=False)
+            self.__init_schema()
+
+    def __init_schema(self):
+        version = self.__db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with self.__db:
+                self.__db.execute("DROP TABLE IF EXISTS outputs")
+
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS outputs (path TEXT PRIMARY KEY,"
+                " source TEXT, source_mtime_ns INTEGER, source_size INTEGER,"
+                " params TEXT, mtime_ns INTEGER, size INTEGER, hash TEXT)"
+            )
+            self.__db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    def __key(self, dest: str) -> str:
+        return os.path.relpath(dest, self.root).replace(os.sep, "/")
+
+    def __entry(self, dest: str) -> tuple | None:
+        with self.__lock:
+            return self.__db.execute(
+                "SELECT source, source_mtime_ns, source_size, params, mtime_ns, size,"
+                " hash FROM outputs WHERE path = ?",
+                (self.__key(dest),),
+            ).fetchone()
+
+    def is_done(
+        self,
+        dest: str,
+        source: str | None,
+        params: str,
+        hash: str | None = None,
+        dest_fp: Fingerprint = None,
+    ) -> bool:
+        """If `dest` was made from `source` with `params` (and has the content
+        `hash`, if given) and hasn't changed since.
+
+        A source that no longer exists, like after deleting originals,
+        doesn't invalidate its output. `dest_fp` saves statting `dest` if
+        it's already known."""
+        entry = self.__entry(dest)
+        if entry is None:
+            return False
+        src, src_mtime_ns, src_size, p, mtime_ns, size, h = entry
+        if p != params or src != source or (hash is not None and h != hash):
+            return False
+
+        if dest_fp is None:
+            dest_fp = fingerprint(dest)
+        if dest_fp != (mtime_ns, size):
+            return False
+
+        if source is not None:
+            source_fp = fingerprint(source)
+            if source_fp != (None, None) and source_fp != (src_mtime_ns, src_size):
+                return False
+        return True
+
+    def record(
+        self,
+        dest: str,
+        source: str | None,
+        source_fp: Fingerprint,
+        params: str,
+        hash: str | None = None,
+    ) -> Fingerprint:
+        """Note that `dest` is done. `source_fp` must be taken before the
+        output was made, so a source changing meanwhile isn't missed.
+
+        Returns the fingerprint recorded for `dest`."""
+        dest_fp = fingerprint(dest)
+        row = (self.__key(dest), source, *source_fp, params, *dest_fp, hash)
+        with self.__lock, self.__db:
+            self.__db.execute(
+                "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row
+            )
+        return dest_fp
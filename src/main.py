@@ -1,4 +1,5 @@
 import os
+from multiprocessing import freeze_support
 
 import data.database as database
 import config
@@ -14,4 +15,5 @@ def main():
 
 if __name__ == "__main__":
     # Assume app is being run at the project root.
+    freeze_support()  # jacket decoding worker processes in PyInstaller builds
     main()
@@ -0,0 +1,140 @@
+"""Spans and counters for finding out where setup time goes.
+
+Instrumented code calls span() and count() unconditionally; they do
+nothing unless a Tracer was started. Traces are written in the Chrome
+trace event format, which chrome://tracing and ui.perfetto.dev open.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator
+
+TRACE_FILENAME = "setup-trace.json"
+
+
+class Tracer:
+    """Collects spans and counters from any thread."""
+
+    def __init__(self):
+        self.__start = time.perf_counter_ns()
+        self.__lock = threading.Lock()
+        self.__events: list[dict] = []
+        self.counters: dict[str, int] = dict()
+
+    def __now_us(self) -> float:
+        return (time.perf_counter_ns() - self.__start) / 1000
+
+    @contextmanager
+    def span(self, name: str, cat: str = "setup", **args) -> Iterator[None]:
+        start = self.__now_us()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": self.__now_us() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if len(args) > 0:
+                event["args"] = args
+            with self.__lock:
+                self.__events.append(event)
+
+    def count(self, name: str, n: int = 1):
+        with self.__lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def write(self, path: str):
+        """Write a Chrome trace JSON file."""
+        threads = {t.ident: t.name for t in threading.enumerate()}
+        with self.__lock:
+            events = list(self.__events)
+            # counters are totals, shown at the end of the trace
+            now = self.__now_us()
+            counters = [
+                {
+                    "name": name,
+                    "ph": "C",
+                    "ts": now,
+                    "pid": os.getpid(),
+                    "args": {name: value},
+                }
+                for name, value in self.counters.items()
+            ]
+        meta = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": threads.get(tid, str(tid))},
+            }
+            for tid in {e["tid"] for e in events if "tid" in e}
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": meta + events + counters, "displayTimeUnit": "ms"}, f
+            )
+
+    def summary(self, limit: int = 12) -> list[str]:
+        """Lines with the spans taking the most time in total, then counters."""
+        totals: dict[str, list[float]] = dict()
+        with self.__lock:
+            for e in self.__events:
+                if e["ph"] == "X":
+                    t = totals.setdefault(e["name"], [0, 0.0, 0.0])
+                    t[0] += 1
+                    t[1] += e["dur"]
+                    t[2] = max(t[2], e["dur"])
+            counters = dict(self.counters)
+
+        lines = []
+        for name, (n, total, longest) in sorted(
+            totals.items(), key=lambda item: item[1][1], reverse=True
+        )[:limit]:
+            lines.append(
+                f"{name}: {total / 1e6:.3f}s"
+                + (f" over {n} (longest {longest / 1e6:.3f}s)" if n > 1 else "")
+            )
+        for name, value in sorted(counters.items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+
+_tracer: Tracer | None = None
+
+
+def start() -> Tracer:
+    """Start collecting spans and counters."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop() -> Tracer | None:
+    """Stop collecting; returns what was collected."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, cat: str = "setup", **args):
+    """Context manager timing its block, if tracing."""
+    tracer = _tracer
+    if tracer is None:
+        return nullcontext()
+    return tracer.span(name, cat, **args)
+
+
+def count(name: str, n: int = 1):
+    """Add to a counter, if tracing."""
+    tracer = _tracer
+    if tracer is not None:
+        tracer.count(name, n)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+from threading import Lock
+
+from data.scan_index import Fingerprint
+from transfer import DEFAULT_STRATEGIES, transfer
+
+CACHE_DIRNAME = "transcode-cache"
+INDEX_FILENAME = "index.sqlite3"
+
+DEFAULT_MAX_BYTES = 8 << 30
+
+
+class TranscodeCache:
+    """Converted audio kept across exports, keyed by the source's identity
+    and the conversion parameters, and evicted least recently used first
+    once the cache grows past `max_bytes`.
+
+    Entries are plain files, so exports can hardlink them if asked to.
+    Last use is tracked in an index rather than by touching the files,
+    since that would change the exported links as well.
+
+    Safe to use from several threads."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        strategies: tuple[str, ...] = DEFAULT_STRATEGIES,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.strategies = strategies
+        self.__lock = Lock()
+
+        os.makedirs(path, exist_ok=True)
+        self.__db = sqlite3.connect(
+            os.path.join(path, INDEX_FILENAME), timeout=30, check_same_thread=False
+        )
+        with self.__db:
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS entries"
+                " (key TEXT PRIMARY KEY, name TEXT, size INTEGER, last_used REAL)"
+            )
+        # forget entries whose files were removed by hand
+        for key, name in self.__db.execute("SELECT key, name FROM entries").fetchall():
+            if not os.path.isfile(os.path.join(path, name)):
+                self.__forget(key)
+        self.__size = self.__db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    @staticmethod
+    def key(src: str, src_fp: Fingerprint, params: str) -> str:
+        identity = f"{os.path.abspath(src)}\0{src_fp[0]}\0{src_fp[1]}\0{params}"
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def __forget(self, key: str):
+        with self.__db:
+            self.__db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def fetch(self, key: str, dest: str) -> bool:
+        """Put the entry for `key` at `dest`; False if there's none."""
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT name FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False
+            with self.__db:
+                self.__db.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+
+        try:
+            transfer(os.path.join(self.path, row[0]), dest, self.strategies)
+        except FileNotFoundError:
+            with self.__lock:
+                self.__forget(key)
+            return False
+        return True
+
+    def store(self, key: str, src: str):
+        """Add a copy of the converted file `src` as the entry for `key`."""
+        name = key + os.path.splitext(src)[1]
+        path = os.path.join(self.path, name)
+        # songs sharing a source and parameters may store the same key at once
+        fd, tmp = tempfile.mkstemp(suffix=".partial", prefix=f"{key}.", dir=self.path)
+        os.close(fd)
+        try:
+            transfer(src, tmp, self.strategies)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        size = os.path.getsize(path)
+
+        with self.__lock:
+            old = self.__db.execute(
+                "SELECT size FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            with self.__db:
+                self.__db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, name, size, time.time()),
+                )
+            self.__size += size - (old[0] if old is not None else 0)
+            self.__evict()
+
+    def __evict(self):
+        """Remove least recently used entries until the cache fits."""
+        if self.__size <= self.max_bytes:
+            return
+        for key, name, size in self.__db.execute(
+            "SELECT key, name, size FROM entries ORDER BY last_used"
+        ).fetchall():
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+            self.__forget(key)
+            self.__size -= size
+            if self.__size <= self.max_bytes:
+                return
@@ -0,0 +1,144 @@
+import errno
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+STRATEGIES = ("hardlink", "reflink", "copy_file_range", "sendfile", "buffered")
+"""Ways to put a file's contents at another path, cheapest first."""
+
+DEFAULT_STRATEGIES = ("reflink", "copy_file_range", "sendfile", "buffered")
+"""Strategies making independent copies. Hardlinks are left out: editing a
+linked file in place would also change the file it was linked from."""
+
+BUFFER_SIZE = 8 << 20
+
+_FICLONE = 0x40049409
+"""ioctl to share a file's extents with another (Btrfs, XFS, ...)."""
+
+_UNSUPPORTED = {
+    errno.EXDEV,
+    errno.EPERM,
+    errno.EACCES,
+    errno.EINVAL,
+    errno.ENOSYS,
+    errno.ENOTTY,
+    errno.EOPNOTSUPP,
+    errno.EBADF,
+    errno.EMLINK,
+    errno.ENOTSOCK,
+}
+"""Errors from a fast path meaning it can't be used here, rather than that
+the copy failed. The buffered copy has no such errors: it is the fallback."""
+
+
+def _hardlink(src: str, dest: str):
+    os.link(src, dest)
+
+
+def _reflink(src: str, dest: str):
+    if fcntl is None:
+        raise OSError(errno.ENOSYS, "reflinks need fcntl")
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        fcntl.ioctl(fdest.fileno(), _FICLONE, fsrc.fileno())
+
+
+def _kernel_copy(copy_range):
+    """Strategy copying in the kernel with `copy_range(src_fd, dest_fd, offset, count)`."""
+
+    def copy(src: str, dest: str):
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            while offset < size:
+                n = copy_range(fsrc.fileno(), fdest.fileno(), offset, size - offset)
+                if n == 0:
+                    if offset == 0:
+                        # some filesystems copy nothing rather than failing
+                        raise OSError(errno.EOPNOTSUPP, "nothing was copied")
+                    break  # source shrank
+                offset += n
+
+    return copy
+
+
+def _copy_file_range(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dest_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dest_fd, src_fd, offset, count)
+
+
+def _buffered(src: str, dest: str):
+    with open(src, "rb", buffering=0) as fsrc, open(dest, "wb", buffering=0) as fdest:
+        size = os.fstat(fsrc.fileno()).st_size
+        if size > 0 and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fdest.fileno(), 0, size)
+            except OSError:
+                pass  # not supported by the filesystem; just write
+
+        buf = memoryview(bytearray(BUFFER_SIZE))
+        while (n := fsrc.readinto(buf)) > 0:
+            fdest.write(buf[:n])
+        fdest.truncate()  # in case the source shrank after preallocating
+
+
+_TRANSFERS = {
+    "hardlink": _hardlink,
+    "reflink": _reflink,
+    "copy_file_range": _kernel_copy(_copy_file_range),
+    "sendfile": _kernel_copy(_sendfile),
+    "buffered": _buffered,
+}
+
+
+def same_filesystem(src: str, dest: str) -> bool:
+    """If `src` can be renamed to `dest` without copying."""
+    try:
+        return os.stat(src).st_dev == os.stat(os.path.dirname(dest) or ".").st_dev
+    except OSError:
+        return False
+
+
+def transfer(
+    src: str, dest: str, strategies: tuple[str, ...] = DEFAULT_STRATEGIES, move=False
+) -> str:
+    """Put the contents of `src` at `dest`, replacing it, with the first
+    strategy that works between the two paths. Copies keep the source's
+    timestamps and permissions like shutil.copy2.
+
+    With `move`, `src` is renamed to `dest` if they are on the same
+    filesystem, and otherwise removed after copying.
+    Returns the strategy used."""
+    if move and same_filesystem(src, dest):
+        os.replace(src, dest)
+        return "rename"
+
+    last_error: OSError = None
+    for name in strategies:
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            _TRANSFERS[name](src, dest)
+        except AttributeError:
+            continue  # os function missing on this platform
+        except OSError as e:
+            if name == "buffered" or e.errno not in _UNSUPPORTED:
+                raise
+            last_error = e
+            continue
+
+        if name != "hardlink":
+            shutil.copystat(src, dest)
+        if move:
+            os.remove(src)
+        return name
+
+    if last_error is not None:
+        raise last_error
+    raise ValueError(f"no usable transfer strategy in {strategies}")
@@ -3,9 +3,9 @@ from datetime import datetime
 from threading import Thread
 from collections import deque
 from queue import Queue, Empty
-from typing import Any, Callable
-from enum import Enum
+from typing import Any, Callable, Iterable
 import os
+import threading
 
 from tkinter import *
 from tkinter import filedialog
@@ -15,18 +15,14 @@ from PIL import Image, ImageTk
 
 from util import resource_path
 import config
-from data import database
+import tracing
+from data import database, videos
+from data.metadata import SongMetadata
+from data.task import TaskState
 
 from .tabs.listing_tab import ListingTab
 
 
-class TaskState(Enum):
-    InProgress = 0
-    Complete = 1
-    Alert = 2
-    Error = 3
-
-
 class ProgressIcon(Frame):
     image = {
         "progress": [
@@ -159,6 +155,52 @@ class TaskProgress(Frame):
         self.__log_func(f"[{self.name}] {msg}")
 
 
+class TaskGraph:
+    """Runs tasks at the same time, each on its own thread once the tasks
+    it depends on are done. Tasks depending on a failed task are skipped."""
+
+    def __init__(self):
+        self.__deps: dict[TaskProgress, list[TaskProgress]] = dict()
+
+    def add(self, task: TaskProgress, after: Iterable[TaskProgress] = ()):
+        """Add a task to run after the tasks in `after`, added before it."""
+        self.__deps[task] = list(after)
+
+    def run(self) -> list[tuple[TaskProgress, Exception]]:
+        """Run every task; returns the ones that raised and what they raised."""
+        done = {t: threading.Event() for t in self.__deps}
+        failed: set[TaskProgress] = set()
+        errors: list[tuple[TaskProgress, Exception]] = []
+
+        def runner(task: TaskProgress):
+            try:
+                for dep in self.__deps[task]:
+                    done[dep].wait()
+                if any(dep in failed for dep in self.__deps[task]):
+                    failed.add(task)
+                    task.log("Skipped, as a task it needs failed.")
+                    task.pbar_set(stop_anim=True)
+                    task.status_set(TaskState.Error)
+                    return
+                with tracing.span(task.name, cat="task"):
+                    task.task(task)
+            except Exception as e:
+                failed.add(task)
+                errors.append((task, e))
+            finally:
+                done[task].set()
+
+        threads = [
+            Thread(target=runner, args=(t,), name=f"task-{t.name}")
+            for t in self.__deps
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return errors
+
+
 class DataSetupWindow(Toplevel):
     def __init__(self, master, run_tasks=False, show_file_picker=False):
         super().__init__(master=master)
@@ -172,6 +214,10 @@ class DataSetupWindow(Toplevel):
         self.protocol("WM_DELETE_WINDOW", self.__action_close)
 
         self.__tasks: deque[TaskProgress] = deque(maxlen=5)
+        self.__graph = TaskGraph()
+        self.__feed = database.SongFeed()
+        self.__table_songs: Iterable[SongMetadata] = ()
+        """Songs for the Songs table, as the running scan finds them"""
         self.__cur_tasks_thread: Thread = None
         self.__working = False
 
@@ -200,8 +246,14 @@ class DataSetupWindow(Toplevel):
         self.__progress_container = Frame(self)
         self.__progress_container.pack(expand=True, side="top", anchor="n", pady=10)
 
-        self.__btn_rescan = Button(self, text="Rescan", command=self.reset_tasks)
-        self.__btn_rescan.pack(pady=(0, 10))
+        buttons = Frame(self)
+        buttons.pack(pady=(0, 10))
+        self.__btn_rescan = Button(buttons, text="Rescan", command=self.reset_tasks)
+        self.__btn_rescan.pack(side=LEFT, padx=2)
+        self.__btn_videos = Button(
+            buttons, text="Convert Videos", command=self.__action_convert_videos
+        )
+        self.__btn_videos.pack(side=LEFT, padx=2)
 
         # Log window
         self.__log_win = ScrolledText(self)
@@ -210,10 +262,14 @@ class DataSetupWindow(Toplevel):
         self.after(10, self.__event_queue_process)
 
     def __event_queue_process(self):
+        songs: list[SongMetadata] = []
         try:
             while True:
                 msg = self.event_queue.get_nowait()
                 match msg[0]:
+                    case "song":
+                        # msg[1] is SongMetadata
+                        songs.append(msg[1])
                     case "working":
                         # msg[1] is bool
                         self.__working = msg[1]
@@ -221,15 +277,18 @@ class DataSetupWindow(Toplevel):
                         if self.__working:  # tasks just started
                             # disable widgets
                             self.__btn_rescan["state"] = "disabled"
+                            self.__btn_videos["state"] = "disabled"
                             self.__entry_path["state"] = "disabled"
                             self.__btn_browse["state"] = "disabled"
                         else:  # tasks just finished
                             # enable widgets
                             self.__btn_rescan["state"] = "normal"
+                            self.__btn_videos["state"] = "normal"
                             self.__entry_path["state"] = "normal"
                             self.__btn_browse["state"] = "normal"
 
                             # update table
+                            songs.clear()
                             ListingTab.instance.table_populate()
                     case "log":
                         # msg[1] is str
@@ -237,6 +296,9 @@ class DataSetupWindow(Toplevel):
         except Empty:
             pass
 
+        # songs found since the last tick go in the table all at once
+        if len(songs) > 0:
+            ListingTab.instance.table_add(songs)
         self.after(10, self.__event_queue_process)
 
     def __log_insert(self, msg: str):
@@ -259,10 +321,21 @@ class DataSetupWindow(Toplevel):
         if result != "":
             self.str_path.set(result)
 
+    def __action_convert_videos(self):
+        if not os.path.isdir(config.video_source_path):
+            result = filedialog.askdirectory(
+                title="Select the game's Movie folder (.usm videos)",
+                initialdir=config.working_path,
+            )
+            if result == "":
+                return
+            config.video_source_path = result
+        self.reset_tasks(convert_videos=True)
+
     def log(self, msg: str):
         self.event_queue.put_nowait(("log", msg))
 
-    def reset_tasks(self):
+    def reset_tasks(self, convert_videos=False):
         while len(self.__tasks) > 0:
             self.__tasks.pop().destroy()
 
@@ -270,29 +343,50 @@ class DataSetupWindow(Toplevel):
             self.str_path.set(os.path.abspath(self.str_path.get()))
             config.working_path = self.str_path.get()
 
+        self.__graph = TaskGraph()
+        # jackets are thumbnailed and songs shown as metadata finds them
+        feed = self.__feed = database.SongFeed()
+        jacket_songs = feed.listen()
+        self.__table_songs = feed.listen()
+
+        t_v = None
+        if convert_videos:
+            # first, so the songs scan finds the new videos
+            t_v = TaskProgress(
+                self.__progress_container, "Videos", videos.convert_videos, self.log
+            )
+            t_v.pack()
+            self.__tasks.append(t_v)
+            self.__graph.add(t_v)
+
         t_md = TaskProgress(
             self.__progress_container,
             "Metadata",
-            database.init_songs,
+            lambda progress: database.init_songs(progress, feed),
             self.log,
         )
         t_md.pack()
         self.__tasks.append(t_md)
+        self.__graph.add(t_md, after=[t_v] if t_v is not None else [])
 
+        # audio doesn't depend on the songs
         t_a = TaskProgress(
             self.__progress_container, "Audio", database.init_audio, self.log
         )
         t_a.pack()
         self.__tasks.append(t_a)
+        self.__graph.add(t_a)
 
         t_j = TaskProgress(
             self.__progress_container,
             "Jackets",
-            database.jackets_progress_task,
+            lambda progress: database.jackets_progress_task(progress, jacket_songs),
             self.log,
         )
         t_j.pack()
         self.__tasks.append(t_j)
+        # skipped along with metadata, which would never close the feed
+        self.__graph.add(t_j, after=[t_v] if t_v is not None else [])
 
         self.start_tasks()
 
@@ -311,14 +405,41 @@ class DataSetupWindow(Toplevel):
         self.log(
             f"Beginning scan at {datetime.now().isoformat(sep=' ', timespec='seconds')}"
         )
-        try:
-            for t in self.__tasks:
-                t.task(t)
-        except Exception as e:
+        tracer = tracing.start()
+        table_thread = Thread(target=self.__songs_thread, args=(self.__table_songs,))
+        table_thread.start()
+        errors = self.__graph.run()
+        # in case metadata was skipped
+        self.__feed.close()
+        table_thread.join()
+        for t, e in errors:
+            self.log(f"ERROR: [{t.name}] {e}")
+        if len(errors) > 0:
             for t in self.__tasks:
                 t.pbar_set(stop_anim=True)
-            self.log(f"ERROR: {e}\n\nAborting.")
+            self.log("\nScan finished with errors.")
+        tracing.stop()
+        self.__log_trace(tracer)
 
         self.log("")
         print("Tasks thread finished")
         self.event_queue.put_nowait(("working", False))
+
+    def __songs_thread(self, songs: Iterable[SongMetadata]):
+        try:
+            for song in songs:
+                self.event_queue.put_nowait(("song", song))
+        except RuntimeError:
+            pass  # the songs scan failed; the graph reports its error
+
+    def __log_trace(self, tracer: tracing.Tracer):
+        """Write the scan's trace to the working folder and summarize it."""
+        path = os.path.join(config.working_path, tracing.TRACE_FILENAME)
+        try:
+            tracer.write(path)
+        except OSError as e:
+            self.log(f"WARNING: Could not write trace to {path}: {e}")
+        else:
+            self.log(f"Timings (trace written to {path}):")
+        for line in tracer.summary():
+            self.log(f"    {line}")
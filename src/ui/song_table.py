@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Iterable
+
+from tkinter.ttk import Treeview
+
+from data.metadata import SongMetadata
+
+
+class SongTable:
+    """Songs shown in a Treeview, sorted and filtered on the Python side.
+
+    Every song gets a row once, on load(); sorting and filtering reorder
+    and detach rows with a single Treeview.set_children call instead of
+    reading cells back and moving rows one by one."""
+
+    def __init__(
+        self,
+        treeview: Treeview,
+        columns: dict[str, Callable[[SongMetadata], str]],
+        sort_keys: dict[str, Callable[[SongMetadata], Any]] = None,
+        stripe_tag: str = None,
+    ):
+        """`columns` makes each column's cell text; `sort_keys` overrides
+        sorting by the lowercased text for some columns."""
+        self.treeview = treeview
+        self.columns = columns
+        self.__sort_key_funcs = sort_keys or dict()
+        self.__stripe_tag = stripe_tag
+
+        self.generation = 0
+        """Incremented whenever songs are loaded or added, so other views can
+        tell the songs changed."""
+        self.__songs: dict[str, SongMetadata] = dict()
+        self.__keys: dict[str, dict[str, Any]] = dict()
+        """Column to song ID to sort key, made when first sorting by the column"""
+        self.__sorted: dict[str, list[str]] = dict()
+        """Column to every song ID in ascending order"""
+
+        self.sort_col: str = None
+        self.sort_reverse = False
+        self.__filter: Callable[[SongMetadata], bool] = None
+        self.__order: list[str] | None = None
+        """Explicit order of the shown songs, instead of sorting"""
+
+        self.ids: list[str] = []
+        """IDs of the shown songs, in order"""
+        self.__odd: set[str] = set()
+        """Shown songs on striped rows"""
+
+    def __len__(self):
+        return len(self.ids)
+
+    def clear(self):
+        self.load([])
+
+    def load(self, songs: Iterable[SongMetadata]):
+        """Replace the songs, inserting a row per song."""
+        # hidden rows aren't children, but still exist
+        self.treeview.delete(*self.__songs.keys())
+        self.__songs = {song.id: song for song in songs}
+        self.__keys.clear()
+        self.__sorted.clear()
+        self.__order = None
+        self.generation += 1
+
+        # striped as they will be shown, so render has nothing to restripe
+        self.__odd = set(self.visible_ids()[1::2]) if self.__stripe_tag else set()
+        for song in self.__songs.values():
+            self.__insert(song, song.id in self.__odd)
+        self.render()
+
+    def add(self, songs: Iterable[SongMetadata]):
+        """Add songs to the loaded ones, e.g. as a scan finds them, inserting
+        a row per song not already in the table."""
+        new = [song for song in songs if song.id not in self.__songs]
+        if len(new) == 0:
+            return
+        for song in new:
+            self.__songs[song.id] = song
+            self.__insert(song, False)  # render restripes it if needed
+        for col, keys in self.__keys.items():
+            key = self.__sort_key_func(col)
+            keys.update((song.id, key(song)) for song in new)
+        self.__sorted.clear()
+        self.generation += 1
+        self.render()
+
+    def songs(self) -> list[SongMetadata]:
+        """Every song in the table, shown or not, in the order added."""
+        return list(self.__songs.values())
+
+    def sort_key(self, col: str) -> dict[str, Any]:
+        """Song ID to sort key for a column."""
+        if col not in self.__keys:
+            key = self.__sort_key_func(col)
+            self.__keys[col] = {id: key(song) for id, song in self.__songs.items()}
+        return self.__keys[col]
+
+    def __sort_key_func(self, col: str) -> Callable[[SongMetadata], Any]:
+        key = self.__sort_key_funcs.get(col)
+        if key is None:
+            cell = self.columns[col]
+            key = lambda song: cell(song).lower()
+        return key
+
+    def sort(self, col: str, reverse: bool = None):
+        """Sort by a column; sorting by the same column again reverses it
+        unless `reverse` is given."""
+        if reverse is None:
+            reverse = col == self.sort_col and not self.sort_reverse
+        self.sort_col = col
+        self.sort_reverse = reverse
+        self.__order = None
+        self.render()
+
+    def set_filter(self, filter: Callable[[SongMetadata], bool] | None):
+        """Show only songs `filter` is true for; None shows all."""
+        self.__filter = filter
+        self.render()
+
+    def show(self, ids: Iterable[str]):
+        """Show exactly these songs, in this order, regardless of sorting."""
+        self.__order = [id for id in ids if id in self.__songs]
+        self.render()
+
+    def visible_ids(self) -> list[str]:
+        """IDs that would be shown, in order."""
+        if self.__order is not None:
+            ids = self.__order
+        elif self.sort_col is None:
+            ids = list(self.__songs.keys())
+        else:
+            if self.sort_col not in self.__sorted:
+                key = self.sort_key(self.sort_col)
+                self.__sorted[self.sort_col] = sorted(self.__songs, key=key.__getitem__)
+            ids = self.__sorted[self.sort_col]
+            if self.sort_reverse:
+                ids = ids[::-1]
+
+        if self.__filter is not None:
+            ids = [id for id in ids if self.__filter(self.__songs[id])]
+        return list(ids)
+
+    def __insert(self, song: SongMetadata, odd: bool):
+        self.treeview.insert(
+            "",
+            "end",
+            iid=song.id,
+            values=tuple(cell(song) for cell in self.columns.values()),
+            tags=(self.__stripe_tag,) if odd else (),
+        )
+
+    def render(self):
+        """Show the visible songs in order with one Tk call, then restripe
+        them with two if any stripe changed."""
+        self.ids = self.visible_ids()
+        self.treeview.set_children("", *self.ids)
+
+        if self.__stripe_tag is not None:
+            odd_ids = self.ids[1::2]
+            odd = set(odd_ids)
+            if odd != self.__odd:
+                # untag the rows striped before, which may be hidden now, then
+                # tag the odd ones; without items, tag remove skips hidden rows
+                tk = self.treeview.tk
+                if len(self.__odd) > 0:
+                    tk.call(
+                        self.treeview,
+                        "tag",
+                        "remove",
+                        self.__stripe_tag,
+                        list(self.__odd),
+                    )
+                if len(odd_ids) > 0:
+                    tk.call(self.treeview, "tag", "add", self.__stripe_tag, odd_ids)
+            self.__odd = odd
+
+        # hidden rows stay in the tree, so keep them out of the selection
+        shown = set(self.ids)
+        hidden = [id for id in self.treeview.selection() if id not in shown]
+        if len(hidden) > 0:
+            self.treeview.selection_remove(*hidden)
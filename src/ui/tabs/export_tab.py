@@ -16,8 +16,19 @@ import config
 import data.database as db
 import data.metadata as md
 from ui import data_setup
+from ui.song_table import SongTable
 from .listing_tab import ListingTab
-from export import export_song
+from export import (
+    ExportOptions,
+    ExportPools,
+    ExportOutput,
+    SongResult,
+    export_song,
+    open_output,
+    open_transcode_cache,
+)
+from transcode_cache import CACHE_DIRNAME, DEFAULT_MAX_BYTES, TranscodeCache
+from transfer import DEFAULT_STRATEGIES
 
 
 class ExportGroup(IntEnum):
@@ -31,9 +42,20 @@ class AudioConvertTarget(StrEnum):
     OGG = "ogg"
 
 
+class OutputFormat(StrEnum):
+    FOLDER = "folder"
+    ZIP = "zip"
+    TAR = "tar"
+
+
 class ExportTab(Frame):
     instance: ExportTab = None
 
+    POLL_BUSY_MS = 50
+    """Event polling interval while exporting"""
+    POLL_IDLE_MS = 400
+    """Longest event polling interval while idle"""
+
     def __init__(self, master):
         ExportTab.instance = self
 
@@ -50,30 +72,42 @@ class ExportTab(Frame):
         self.working = False
         self.just_finished = False
         self.aborting = False
+        self.__setup_error: str | None = None
 
         # progress tracking
-        self.songs_queue: Queue[str] = Queue(maxsize=400)
+        self.songs_queue: Queue[str] = Queue()
         self.__pbar_val = IntVar(self, 0)
         self.progress_image = {
             "success": ImageTk.PhotoImage(data_setup.ProgressIcon.image["complete"]),
             "alert": ImageTk.PhotoImage(data_setup.ProgressIcon.image["alert"]),
             "error": ImageTk.PhotoImage(data_setup.ProgressIcon.image["error"]),
         }
+        # only changed on the Tk thread, from SongResults of the workers
         self.songs_processed: set[str] = set()
+        self.__rows_marked: set[str] = set()
+        """Songs whose rows show an export status"""
         self.song_alerts: dict[str, list[str]] = dict()
         self.song_errors: dict[str, str] = dict()
 
         # export options
         self.option_game_subfolders = BooleanVar(self)
         self.option_delete_originals = BooleanVar(self)
+        self.option_hardlink = BooleanVar(self)
         self.option_convert_audio = BooleanVar(self)
         self.option_convert_audio.trace_add("write", self.__action_audio_conv_change)
         self.option_audio_target = StringVar(self, AudioConvertTarget.MP3)
+        self.option_transcode_cache = BooleanVar(self)
+        self.option_transcode_cache_gib = DoubleVar(
+            self, DEFAULT_MAX_BYTES / (1 << 30)
+        )
         self.option_exclude_videos = BooleanVar(self)
+        self.option_output_format = StringVar(self, OutputFormat.FOLDER)
         self.option_threads = IntVar(self, 4)
+        self.option_encoders = IntVar(self, default_ffmpeg_jobs())
 
         self.__init_widgets()
-        self.after(200, self.__event_queue_process)
+        self.__poll_ms = self.POLL_IDLE_MS
+        self.after(self.__poll_ms, self.__event_queue_process)
 
     def __init_widgets(self):
         ## RIGHT SIDE (export) ##
@@ -105,6 +139,17 @@ class ExportTab(Frame):
         self.treeview.heading("artist", text="Artist", anchor=W)
         self.treeview.heading("game", text="Game", anchor=W)
         self.treeview.column("game", width=150, stretch=False)
+        self.table = SongTable(
+            self.treeview,
+            {
+                "id": lambda song: song.id,
+                "title": lambda song: song.name,
+                "artist": lambda song: song.artist,
+                "game": lambda song: md.version_to_game[song.version],
+            },
+        )
+        self.__table_generation = 0
+        """ListingTab table generation the rows were made for"""
 
         # Export path and button
         export_btm = Frame(self.right_container)
@@ -188,6 +233,33 @@ class ExportTab(Frame):
             textvariable=self.option_audio_target,
         )
         self.combobox_audio_conv_target.pack(pady=(0, 5))
+        self.check_transcode_cache = Checkbutton(
+            audio_conv_options,
+            text=f"Keep Converted Audio for Later Exports\n"
+            f"(in working folder's {CACHE_DIRNAME})",
+            variable=self.option_transcode_cache,
+            state=DISABLED,
+        )
+        self.check_transcode_cache.pack(anchor="w", padx=5)
+        cache_size_container = Frame(audio_conv_options)
+        cache_size_container.pack(anchor="w", padx=5, pady=(0, 5))
+        Label(cache_size_container, text="Up to (GiB)").pack(side=LEFT)
+        self.entry_transcode_cache_gib = Entry(
+            cache_size_container,
+            textvariable=self.option_transcode_cache_gib,
+            width=8,
+            state=DISABLED,
+        )
+        self.entry_transcode_cache_gib.pack(side=LEFT, padx=5)
+
+        output_options = LabelFrame(self.left_container, text="Output")
+        output_options.pack(fill=X, padx=(5, 15), pady=(0, 20))
+        Combobox(
+            output_options,
+            state="readonly",
+            values=[s.value for s in OutputFormat],
+            textvariable=self.option_output_format,
+        ).pack(pady=5)
 
         Checkbutton(
             self.left_container,
@@ -207,12 +279,22 @@ class ExportTab(Frame):
             variable=self.option_delete_originals,
         ).pack(anchor="w", padx=5)
 
+        Checkbutton(
+            self.left_container,
+            text="Hardlink Instead of Copying",
+            variable=self.option_hardlink,
+        ).pack(anchor="w", padx=5)
+
         threads_container = Frame(self.left_container)
         threads_container.pack(fill=X, padx=(5, 15), pady=(10, 20))
-        Label(threads_container, text="Threads").pack(anchor="w", padx=5)
-        Entry(threads_container, textvariable=self.option_threads, width=8).pack(
-            side=LEFT, padx=5
-        )
+        for text, var in (
+            ("Threads", self.option_threads),
+            ("Encoders", self.option_encoders),
+        ):
+            column = Frame(threads_container)
+            column.pack(side=LEFT)
+            Label(column, text=text).pack(anchor="w", padx=5)
+            Entry(column, textvariable=var, width=8).pack(anchor="w", padx=5)
 
         export_msg_container = LabelFrame(self.left_container, text="Warnings/Errors")
         export_msg_container.pack(fill=BOTH, expand=True, padx=5, pady=10)
@@ -232,96 +314,104 @@ class ExportTab(Frame):
         self.lbl_song_stats.pack(anchor=SE, padx=5, pady=(0, 5))
 
     def __event_queue_process(self):
-        try:
-            while True:
+        """Handle the events queued since the last tick together: only the
+        latest status of each song is shown, and the progress bar and
+        stats are updated once."""
+        statuses: dict[str, str] = dict()
+        """ID to latest status ("working", "success", "alert", "error")"""
+        step = 0
+        prog = None
+        maximum = None
+        finished = False
+
+        # only what's queued now, so busy workers can't keep this going
+        for _ in range(self.ui_queue.qsize()):
+            try:
                 msg = self.ui_queue.get_nowait()
-                match msg[0]:
-                    case "p_bar":
-                        # msg[1]: int (step)
-                        # msg[2]: int (prog)
-                        # msg[3]: int (max)
-                        self.set_pbar(msg[1], msg[2], msg[3])
-                    case "table_status":
-                        # msg[1]: str (id)
-                        # msg[2]: str ("working", "success", "alert", "error")
-                        if msg[2] != "working":
-                            self.treeview.item(
-                                msg[1],
-                                tags="done",
-                                image=self.progress_image[msg[2]],
-                                text="",
-                            )
-                            self.treeview.selection_remove(msg[1])
-                        else:
-                            self.treeview.item(
-                                msg[1],
-                                text="WORKING...",
-                                tags=None,
-                                image=None,
-                            )
-                            self.treeview.selection_add(msg[1])
-                    case "finished":
-                        self.__export_end()
-                self.__refresh_song_stats()
-        except Empty:
-            pass
-
-        self.after(200, self.__event_queue_process)
+            except Empty:
+                break
+            match msg[0]:
+                case "p_bar":
+                    # msg[1]: int (step)
+                    # msg[2]: int (prog)
+                    # msg[3]: int (max)
+                    if msg[2] is not None:
+                        prog = msg[2]
+                        step = 0
+                    step += msg[1] or 0
+                    maximum = msg[3] if msg[3] is not None else maximum
+                case "table_status":
+                    # msg[1]: str (id)
+                    # msg[2]: str ("working")
+                    statuses[msg[1]] = msg[2]
+                case "result":
+                    # msg[1]: SongResult
+                    result: SongResult = msg[1]
+                    statuses[result.id] = result.status
+                    self.songs_processed.add(result.id)
+                    if result.error is not None:
+                        self.song_errors[result.id] = result.error
+                    elif len(result.alerts) > 0:
+                        self.song_alerts[result.id] = list(result.alerts)
+                    step += 1
+                case "setup_error":
+                    # msg[1]: str (error)
+                    self.__setup_error = msg[1]
+                case "finished":
+                    finished = True
+
+        working = [id for id, status in statuses.items() if status == "working"]
+        done = [id for id, status in statuses.items() if status != "working"]
+        for id in working:
+            self.treeview.item(id, text="WORKING...", tags=None, image=None)
+        for id in done:
+            self.treeview.item(
+                id, tags="done", image=self.progress_image[statuses[id]], text=""
+            )
+        if len(working) > 0:
+            self.treeview.selection_add(*working)
+        if len(done) > 0:
+            self.treeview.selection_remove(*done)
+        self.__rows_marked.update(statuses)
+
+        busy = len(statuses) > 0 or step != 0 or prog is not None or finished
+        if busy:
+            self.set_pbar(step if step != 0 else None, prog, maximum)
+            self.__refresh_song_stats()
+        if finished:
+            self.__export_end()
+
+        # poll often while events come in, backing off while idle
+        if busy or self.working:
+            self.__poll_ms = self.POLL_BUSY_MS
+        else:
+            self.__poll_ms = min(self.__poll_ms * 2, self.POLL_IDLE_MS)
+        self.after(self.__poll_ms, self.__event_queue_process)
 
     def __refresh_exports_table(self, *_):
-        self.treeview.delete(*self.treeview.get_children())
+        listing = ListingTab.instance
+        if self.__table_generation != listing.table.generation:
+            # songs were rescanned, or are still being found
+            self.table.load(listing.table.songs())
+            self.__table_generation = listing.table.generation
+            self.__rows_marked.clear()
+        for id in self.__rows_marked:
+            self.treeview.item(id, tags=(), image="", text="")
+        self.__rows_marked.clear()
 
         match self.export_group.get():
             case ExportGroup.ALL:
-                for i, song in enumerate(db.metadata.values()):
-                    self.treeview.insert(
-                        "",
-                        "end",
-                        iid=song.id,
-                        tags=("oddrow" if i % 2 == 1 else ""),
-                        values=(
-                            song.id,
-                            song.name,
-                            song.artist,
-                            md.version_to_game[song.version],
-                        ),
-                    )
+                self.table.show(song.id for song in listing.table.songs())
             case ExportGroup.SELECTED:
-                for i, id in enumerate(ListingTab.instance.treeview.selection()):
-                    song = db.metadata[id]
-                    self.treeview.insert(
-                        "",
-                        "end",
-                        tags=("oddrow" if i % 2 == 1 else ""),
-                        iid=song.id,
-                        values=(
-                            song.id,
-                            song.name,
-                            song.artist,
-                            md.version_to_game[song.version],
-                        ),
-                    )
+                self.table.show(listing.treeview.selection())
             case ExportGroup.FILTERED:
-                for i, id in enumerate(ListingTab.instance.treeview.get_children()):
-                    song = db.metadata[id]
-                    self.treeview.insert(
-                        "",
-                        "end",
-                        tags=("oddrow" if i % 2 == 1 else ""),
-                        iid=song.id,
-                        values=(
-                            song.id,
-                            song.name,
-                            song.artist,
-                            md.version_to_game[song.version],
-                        ),
-                    )
+                self.table.show(listing.table.ids)
         self.__refresh_song_stats()
 
     def __refresh_song_stats(self):
         self.lbl_song_stats.configure(
             text=(
-                f"{len(self.songs_processed)}/{len(self.treeview.get_children())}"
+                f"{len(self.songs_processed)}/{len(self.table)}"
                 f" song{"s" if len(self.songs_processed) != 1 else ""} processed"
             )
         )
@@ -335,8 +425,13 @@ class ExportTab(Frame):
             self.export_path.set(result)
 
     def __action_audio_conv_change(self, *_):
+        converting = self.option_convert_audio.get()
         self.combobox_audio_conv_target.configure(
-            state="readonly" if self.option_convert_audio.get() else DISABLED
+            state="readonly" if converting else DISABLED
+        )
+        self.check_transcode_cache.configure(state=NORMAL if converting else DISABLED)
+        self.entry_transcode_cache_gib.configure(
+            state=NORMAL if converting else DISABLED
         )
 
     def __action_table_hover(self, event):
@@ -366,10 +461,15 @@ class ExportTab(Frame):
         disable_children_widgets(self.left_container)
         enable_children_widgets(self.lbl_messages.master)
 
-        for id in self.treeview.get_children():
+        # songs an aborted export didn't get to
+        while not self.songs_queue.empty():
+            self.songs_queue.get_nowait()
+        for id in self.table.ids:
             self.songs_queue.put(id)
+        self.set_pbar(prog=0, maximum=len(self.table))
 
-        self.start_export_thread()
+        # read from Tk here, once; workers only see this snapshot
+        self.start_export_thread(self.export_options())
 
     def __action_reset(self, *_):
         self.__btn_export.configure(text="Export", command=self.__action_export)
@@ -397,81 +497,142 @@ class ExportTab(Frame):
         )
 
         stats = (
-            f"Processed {len(self.songs_processed)}/{len(self.treeview.get_children())} songs "
+            f"Processed {len(self.songs_processed)}/{len(self.table)} songs "
             f"with {len(self.song_alerts)} warnings "
             f"and {len(self.song_errors)} errors."
         )
 
-        if self.aborting:
+        if self.__setup_error is not None:
+            messagebox.showerror(
+                "Export Failed", f"Could not start the export: {self.__setup_error}"
+            )
+            self.__setup_error = None
+            self.aborting = False
+        elif self.aborting:
             messagebox.showwarning("Export Aborted", stats)
             self.aborting = False
         else:
             messagebox.showinfo("Export Complete", stats)
 
-    def start_export_thread(self):
+    def start_export_thread(self, options: ExportOptions):
         """Export thread starter"""
         if self.__cur_export_thread is not None:
             self.__cur_export_thread.join()
-        self.__cur_export_thread = Thread(target=self.__export_thread)
+        self.__cur_export_thread = Thread(target=self.__export_thread, args=(options,))
 
         self.__cur_export_thread.start()
 
-    def __export_thread(self):
-        # create worker threads
-        work_threads = []
-        for i in range(self.option_threads.get()):
-            t = Thread(target=self.__export_thread_worker)
-            t.start()
-            work_threads.append(t)
-
-        # wait for worker threads to finish
-        for t in work_threads:
-            t.join()
-
-        work_threads.clear()
-        print("Export thread finished")
-        self.working = False
-        self.just_finished = True
-        self.ui_queue.put_nowait(("finished",))
-
-    def __export_thread_worker(self):
-        total = len(self.treeview.get_children())
+    def __export_thread(self, options: ExportOptions):
+        pools = None
+        output = None
+        cache = None
+        work_threads: list[Thread] = []
+        try:
+            pools = ExportPools(options)
+            output = open_output(options, pools)
+            cache = open_transcode_cache(options)
+
+            # create worker threads
+            for i in range(options.workers):
+                t = Thread(
+                    target=self.__export_thread_worker,
+                    args=(options, pools, output, cache),
+                )
+                t.start()
+                work_threads.append(t)
+        except Exception as e:
+            print(f"Could not start the export: {e}")
+            traceback.print_exc()
+            self.ui_queue.put_nowait(("setup_error", str(e)))
+        finally:
+            # wait for worker threads to finish
+            for t in work_threads:
+                t.join()
+            work_threads.clear()
+            if pools is not None:
+                pools.shutdown()
+            if output is not None:
+                try:
+                    output.close()
+                except Exception as e:
+                    print(f"Could not finish {options.archive}: {e}")
+                    traceback.print_exc()
+            if cache is not None:
+                cache.close()
+            print("Export thread finished")
+            self.working = False
+            self.just_finished = True
+            self.ui_queue.put_nowait(("finished",))
+
+    def __export_thread_worker(
+        self,
+        options: ExportOptions,
+        pools: ExportPools,
+        output: ExportOutput,
+        cache: TranscodeCache | None,
+    ):
         while not self.aborting:
             try:
                 id = self.songs_queue.get(block=False)
-                self.ui_queue.put_nowait(("table_status", id, "working"))
+            except Empty:
+                return
+            self.ui_queue.put_nowait(("table_status", id, "working"))
 
-                # Export
-                song = db.metadata[id]
-                print(f"Exporting {id} ({song.artist} - {song.name})...")
-                try:
-                    alerts = export_song(song)
-                except Exception as e:
-                    print(f"Error exporting {id}: {e}")
-                    traceback.print_exc()
-                    self.song_errors[id] = str(e)
-                    self.ui_queue.put_nowait(("table_status", id, "error"))
-                    self.songs_processed.add(id)
-                    continue
-                self.songs_processed.add(id)
-
-                if len(alerts) == 0:
-                    # no issues
-                    self.ui_queue.put_nowait(("table_status", id, "success"))
-                else:
-                    self.ui_queue.put_nowait(("table_status", id, "alert"))
+            # Export
+            song = db.metadata[id]
+            print(f"Exporting {id} ({song.artist} - {song.name})...")
+            try:
+                alerts = export_song(song, options, pools, output, cache)
+            except Exception as e:
+                print(f"Error exporting {id}: {e}")
+                traceback.print_exc()
+                result = SongResult(id, error=str(e))
+            else:
+                result = SongResult(id, tuple(alerts))
+                if len(alerts) > 0:
                     print(f"Exported with warnings:")
                     for a in alerts:
                         print(f"\t{a}")
-                    self.song_alerts[id] = alerts
-
-                self.ui_queue.put_nowait(("p_bar", 1, None, total))
-            except Empty:
-                return
+            self.ui_queue.put_nowait(("result", result))
 
         # here because self.aborted is True
         print("Export has been aborted; ending worker thread...")
 
+    def export_options(self) -> ExportOptions:
+        """Export options as currently set in the UI."""
+        output_format = self.option_output_format.get()
+        archive = None
+        if output_format != OutputFormat.FOLDER:
+            archive = f"{config.export_path}.{output_format}"
+        return ExportOptions(
+            output_path=config.export_path,
+            audio_target=(
+                self.option_audio_target.get()
+                if self.option_convert_audio.get()
+                else None
+            ),
+            game_subfolders=self.option_game_subfolders.get(),
+            exclude_videos=self.option_exclude_videos.get(),
+            delete_originals=self.option_delete_originals.get(),
+            workers=self.option_threads.get(),
+            encoders=self.option_encoders.get(),
+            transfer=(
+                ("hardlink", *DEFAULT_STRATEGIES)
+                if self.option_hardlink.get()
+                else DEFAULT_STRATEGIES
+            ),
+            transcode_cache=(
+                os.path.join(config.working_path, CACHE_DIRNAME)
+                if self.option_transcode_cache.get()
+                else None
+            ),
+            transcode_cache_bytes=int(
+                self.option_transcode_cache_gib.get() * (1 << 30)
+            ),
+            archive=archive,
+            archive_format=output_format if archive is not None else "zip",
+        )
+
     def set_pbar(self, step: int = None, prog: int = None, maximum: int = None):
         if maximum is not None:
             self.__pbar_export["max"] = maximum
@@ -487,7 +648,8 @@ class ExportTab(Frame):
         if (self.working) or (not self.working and self.just_finished):
             return
 
-        if ListingTab.instance.filter_game.get() == "None":
+        filtered = ListingTab.instance.is_filtered()
+        if not filtered:
             self.radio_exp_filtered.configure(state=DISABLED)
         else:
             self.radio_exp_filtered.configure(state=NORMAL)
@@ -495,11 +657,11 @@ class ExportTab(Frame):
         if len(ListingTab.instance.treeview.selection()) == 0:
             self.radio_exp_selected.configure(state=DISABLED)
             if self.export_group.get() in (0, ExportGroup.SELECTED):
-                if ListingTab.instance.filter_game.get() == "None":
+                if not filtered:
                     self.export_group.set(ExportGroup.ALL)
                 else:
                     self.export_group.set(ExportGroup.FILTERED)
-            elif ListingTab.instance.filter_game.get() != "None":
+            elif filtered:
                 self.export_group.set(ExportGroup.FILTERED)
         else:
             self.radio_exp_selected.configure(state=NORMAL)
@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from enum import IntEnum
+from queue import Empty, Queue
+from threading import Condition, Thread
+from typing import Callable
 
 from ..util import *
+from ..song_table import SongTable
 
 from tkinter import *
 from tkinter.ttk import *
@@ -13,6 +18,74 @@ from PIL import Image, ImageTk
 from util import resource_path
 import data.database as db
 from data.metadata import *
+from data.facets import FacetIndex
+from data.search import SearchIndex
+
+
+class JacketPreviews:
+    """Bounded LRU of jacket preview Tk images.
+
+    Jackets are loaded on a background thread in the order they were last
+    requested; Tk images are made from them on the Tk thread."""
+
+    CAPACITY = 32
+
+    def __init__(self, widget: Widget, on_loaded: Callable[[str | None], None]):
+        self.__widget = widget
+        self.__on_loaded = on_loaded
+        self.__images: OrderedDict[str, ImageTk.PhotoImage] = OrderedDict()
+        self.__loaded: Queue[tuple[str, Image.Image | None]] = Queue()
+
+        self.__wanted: list[str] = []
+        self.__wanted_cv = Condition()
+        Thread(target=self.__loader_thread, daemon=True).start()
+        self.__widget.after(50, self.__loaded_queue_process)
+
+    def get(self, id: str) -> ImageTk.PhotoImage | None:
+        """Tk image of a jacket if it's loaded."""
+        if id not in self.__images:
+            return None
+        self.__images.move_to_end(id)
+        return self.__images[id]
+
+    def request(self, ids: list[str]):
+        """Load jackets that aren't loaded yet, in order, replacing earlier requests."""
+        with self.__wanted_cv:
+            self.__wanted = [id for id in ids if id not in self.__images]
+            self.__wanted_cv.notify()
+
+    def invalidate(self):
+        """Drop loaded images, e.g. after a rescan. Safe to call from any thread."""
+        self.__loaded.put_nowait(("", None))
+
+    def __loader_thread(self):
+        while True:
+            with self.__wanted_cv:
+                while len(self.__wanted) == 0:
+                    self.__wanted_cv.wait()
+                id = self.__wanted.pop(0)
+            img = db.load_jacket_preview(id)
+            if img is not None:
+                self.__loaded.put_nowait((id, img))
+
+    def __loaded_queue_process(self):
+        try:
+            while True:
+                id, img = self.__loaded.get_nowait()
+                if img is None:
+                    self.__images.clear()
+                    self.__on_loaded(None)
+                    continue
+
+                self.__images[id] = ImageTk.PhotoImage(img)
+                self.__images.move_to_end(id)
+                while len(self.__images) > self.CAPACITY:
+                    self.__images.popitem(last=False)
+                self.__on_loaded(id)
+        except Empty:
+            pass
+
+        self.__widget.after(50, self.__loaded_queue_process)
 
 
 class MetadataPanel(Frame):
@@ -24,13 +97,15 @@ class MetadataPanel(Frame):
         super().__init__(master, width=220, relief=GROOVE)
         self.pack_propagate(False)
         self.init_widgets()
-        self.jackets: dict[str, ImageTk.PhotoImage] = {}
+        self.song: SongMetadata = None
+        self.jackets = JacketPreviews(self, self.__on_jacket_loaded)
 
     def init_widgets(self):
         self.lbl_id = Label(self, text="Song ID", anchor=CENTER, background="lightgray")
         self.lbl_id.pack(fill=X, padx=(1, 2), pady=1)
 
-        self.image = ImageTk.PhotoImage(self.img_jacket_placeholder)
+        self.image_placeholder = ImageTk.PhotoImage(self.img_jacket_placeholder)
+        self.image = self.image_placeholder
         self.md_img = Label(self, image=self.image)
         self.md_img.pack(pady=10)
 
@@ -51,16 +126,32 @@ class MetadataPanel(Frame):
         # Spacer
         Frame(self, height=10).pack(fill="y")
 
-    def set_song(self, song: SongMetadata):
+    def set_song(self, song: SongMetadata, neighbours: list[str] | None = None):
+        """Show a song; jackets of `neighbours` are loaded ahead of time."""
+        self.song = song
         self.lbl_id.configure(text=song.id)
-        self.image = self.jackets[song.id]
-        self.md_img.configure(image=self.image)
+        self.__show_jacket()
+        self.jackets.request([song.id] + (neighbours or []))
         self.lbl_name.configure(text=song.name)
         try_ellipsis(self.lbl_name)
         self.lbl_artist.configure(text=song.artist)
         try_ellipsis(self.lbl_artist)
         self.lbl_game.configure(text=version_to_game[song.version])
 
+    def __show_jacket(self):
+        image = self.jackets.get(self.song.id)
+        self.image = image if image is not None else self.image_placeholder
+        self.md_img.configure(image=self.image)
+
+    def __on_jacket_loaded(self, id: str | None):
+        if self.song is None:
+            return
+        if id is None:  # previews were invalidated
+            self.__show_jacket()
+            self.jackets.request([self.song.id])
+        elif id == self.song.id:
+            self.__show_jacket()
+
 
 class ListingTab(Frame):
     instance: ListingTab = None
@@ -76,12 +167,47 @@ class ListingTab(Frame):
         ListingTab.instance = self
         super().__init__(master)
 
-        self.__table_cur_col_sort: str = None
-        self.__table_rev_sort: bool = False
         self.filter_game = StringVar(self, "None")
-        self.filter_game.trace_add("write", lambda *_: self.table_populate())
+        self.filter_genre = StringVar(self, "Any")
+        self.filter_designer = StringVar(self, "Any")
+        self.filter_difficulty = StringVar(self, "Any")
+        self.filter_min_level = StringVar(self, "Any")
+        self.filter_max_level = StringVar(self, "Any")
+        self.filter_video = StringVar(self, "Any")
+        self.search = StringVar(self)
+        for var in (
+            self.filter_game,
+            self.filter_genre,
+            self.filter_designer,
+            self.filter_difficulty,
+            self.filter_min_level,
+            self.filter_max_level,
+            self.filter_video,
+            self.search,
+        ):
+            var.trace_add("write", self.__action_filter_change)
+        self.__filtered = False
+        self.__search_index: SearchIndex = None
+        """Made on the first search after the table's songs change"""
+        self.facets = FacetIndex([])
+        self.__indexed_generation = -1
+        """Table generation the facets and search index were made for"""
         self.__init_widgets()
 
+        self.table = SongTable(
+            self.treeview,
+            {
+                "id": lambda song: song.id,
+                "title": lambda song: song.name,
+                "artist": lambda song: song.artist,
+                "genre": lambda song: category_index[song.genre_id],
+            },
+            # titles sort by their reading
+            sort_keys={"title": lambda song: song.rubi or ""},
+            stripe_tag="oddrow",
+        )
+        self.table.sort("id")
+
     def __init_widgets(self):
         ## Left Half
         left_container = Frame(self)
@@ -114,7 +240,66 @@ class ListingTab(Frame):
 
         filter_container = Frame(left_container)
         filter_container.pack(fill=X, side=BOTTOM, pady=(2, 0), padx=2)
-        Label(filter_container, text="Filter by game version:").pack(side=LEFT, padx=2)
+        facet_container = Frame(left_container)
+        facet_container.pack(fill=X, side=BOTTOM, pady=(2, 0), padx=2)
+        Label(facet_container, text="Genre:").pack(side=LEFT, padx=2)
+        Combobox(
+            facet_container,
+            state="readonly",
+            width=14,
+            values=["Any"] + [v for k, v in category_index.items() if k >= 0],
+            textvariable=self.filter_genre,
+        ).pack(side=LEFT, padx=2)
+        Label(facet_container, text="Chart:").pack(side=LEFT, padx=2)
+        Combobox(
+            facet_container,
+            state="readonly",
+            width=8,
+            values=["Any"] + [d.name for d in DifficultyName],
+            textvariable=self.filter_difficulty,
+        ).pack(side=LEFT, padx=2)
+        self.__cmb_min_level = Combobox(
+            facet_container,
+            state="readonly",
+            width=4,
+            values=["Any"],
+            textvariable=self.filter_min_level,
+            postcommand=self.__index_songs,
+        )
+        self.__cmb_min_level.pack(side=LEFT, padx=2)
+        Label(facet_container, text="to").pack(side=LEFT)
+        self.__cmb_max_level = Combobox(
+            facet_container,
+            state="readonly",
+            width=4,
+            values=["Any"],
+            textvariable=self.filter_max_level,
+            postcommand=self.__index_songs,
+        )
+        self.__cmb_max_level.pack(side=LEFT, padx=2)
+        Label(facet_container, text="Designer:").pack(side=LEFT, padx=2)
+        self.__cmb_designer = Combobox(
+            facet_container,
+            state="readonly",
+            width=12,
+            values=["Any"],
+            textvariable=self.filter_designer,
+            postcommand=self.__index_songs,
+        )
+        self.__cmb_designer.pack(side=LEFT, padx=2)
+        Combobox(
+            facet_container,
+            state="readonly",
+            width=13,
+            values=["Any", "With video", "Without video"],
+            textvariable=self.filter_video,
+        ).pack(side=LEFT, padx=2)
+
+        Label(filter_container, text="Search:").pack(side=LEFT, padx=2)
+        Entry(filter_container, width=20, textvariable=self.search).pack(
+            side=LEFT, pady=(2, 0), padx=2
+        )
+        Label(filter_container, text="Game:").pack(side=LEFT, padx=2)
         Combobox(
             filter_container,
             state="readonly",
@@ -147,76 +332,123 @@ class ListingTab(Frame):
 
         if elem == "heading":
             # sort by selected column
-            col = self.treeview.identify_column(event.x)
-            self.table_sort(col)
+            col = self.treeview.column(self.treeview.identify_column(event.x), "id")
+            if col in self.table.columns:
+                self.table_sort(col)
 
     def __on_table_select(self, event):
         if len(self.treeview.selection()) == 0:
             return
         id = self.treeview.selection()[-1]
-        self.md_panel.set_song(db.metadata[id])
+        self.md_panel.set_song(db.metadata[id], self.__table_neighbours(id))
         self.refresh_lbl_selected()
 
     def refresh_lbl_selected(self):
         """Refresh the label that shows how many songs are selected."""
         self.lbl_selected.configure(
             text=(
-                f"{len(self.treeview.selection())}/{len(self.treeview.get_children())}"
+                f"{len(self.treeview.selection())}/{len(self.table)}"
                 f" song{"s" if len(self.treeview.selection()) != 1 else ""} selected for export"
             )
         )
 
-    def refresh_jacket_previews(self):
-        """Refresh the jacket previews."""
-        self.md_panel.jackets.clear()
-        for id, img in db.jacket_preview.items():
-            self.md_panel.jackets[id] = ImageTk.PhotoImage(img)
+    def __table_neighbours(self, id: str, count: int = 3) -> list[str]:
+        """Up to `count` rows on each side of a row, nearest first."""
+        ret = []
+        prev, next = id, id
+        for _ in range(count):
+            prev = self.treeview.prev(prev) if prev != "" else ""
+            next = self.treeview.next(next) if next != "" else ""
+            ret += [i for i in (next, prev) if i != ""]
+        return ret
 
     def table_clear(self):
-        self.treeview.delete(*self.treeview.get_children())
+        self.table.clear()
 
     def table_populate(self):
-        """Populate the table with songs."""
-        self.table_clear()
-
-        for song in db.metadata.values():
-            if (
-                self.filter_game.get() != "None"
-                and song.version != game_to_version[self.filter_game.get()]
-            ):
-                continue
-
-            self.treeview.insert(
-                "",
-                "end",
-                id=song.id,
-                values=(song.id, song.name, song.artist, category_index[song.genre_id]),
-            )
+        """Populate the table with the scanned songs. Songs added while
+        scanning keep their rows, and so stay selected."""
+        self.table.add(db.metadata.values())
+        self.__index_songs()
+        self.__action_filter_change()
+
+    def table_add(self, songs: list[SongMetadata]):
+        """Add songs to the table as a scan finds them."""
+        self.table.add(songs)
+        if self.__filtered:
+            self.__action_filter_change()
+        else:
+            self.refresh_lbl_selected()
 
-        self.table_sort("id")
-        self.refresh_lbl_selected()
+    def __index_songs(self):
+        """Remake the facets for the table's songs if they changed. While
+        scanning, that's only done once filtering or picking a facet."""
+        if self.__indexed_generation == self.table.generation:
+            return
+        self.__indexed_generation = self.table.generation
+        self.__search_index = None
+        self.facets = FacetIndex(self.table.songs())
+
+        levels = ["Any"] + list(dict.fromkeys(map(level_str, self.facets.levels())))
+        self.__cmb_min_level.configure(values=levels)
+        self.__cmb_max_level.configure(values=levels)
+        self.__cmb_designer.configure(
+            values=["Any"] + sorted(self.facets.designers, key=str.lower)
+        )
 
     def table_sort(self, col: str):
-        """Sort the table by a column."""
-        rows = [
-            (self.treeview.set(item, col).lower(), item)
-            for item in self.treeview.get_children("")
-        ]
-
-        if col == self.__table_cur_col_sort:
-            self.__table_rev_sort = not self.__table_rev_sort
+        """Sort the table by a column, reversing it if it already is."""
+        self.table.sort(col)
+
+    def is_filtered(self) -> bool:
+        """Whether the table shows only some songs."""
+        return self.__filtered
+
+    def __facet_matches(self) -> set[str] | None:
+        """IDs of songs matching the facet filters; None if there are none."""
+        filters = dict()
+        if self.filter_game.get() != "None":
+            filters["versions"] = [game_to_version[self.filter_game.get()]]
+        if self.filter_genre.get() != "Any":
+            filters["genres"] = [
+                k for k, v in category_index.items() if v == self.filter_genre.get()
+            ]
+        if self.filter_designer.get() != "Any":
+            filters["designers"] = [self.filter_designer.get()]
+        if self.filter_difficulty.get() != "Any":
+            filters["difficulty"] = DifficultyName[self.filter_difficulty.get()].value
+        if self.filter_min_level.get() != "Any":
+            filters["min_level"] = _level_bounds(self.filter_min_level.get())[0]
+        if self.filter_max_level.get() != "Any":
+            filters["max_level"] = _level_bounds(self.filter_max_level.get())[1]
+        if self.filter_video.get() != "Any":
+            filters["video"] = self.filter_video.get() == "With video"
+
+        if len(filters) == 0:
+            return None
+        self.__index_songs()
+        return set(self.facets.song_ids(self.facets.query(**filters)))
+
+    def __action_filter_change(self, *_):
+        matches = self.__facet_matches()
+        if self.search.get().strip() != "":
+            self.__index_songs()
+            if self.__search_index is None:
+                self.__search_index = SearchIndex(self.table.songs())
+            found = self.__search_index.search(self.search.get())
+            matches = found if matches is None else matches & found
+
+        self.__filtered = matches is not None
+        if matches is None:
+            self.table.set_filter(None)
         else:
-            self.__table_rev_sort = False
-
-        if col == "#2":
-            rows.sort(
-                reverse=self.__table_rev_sort, key=lambda it: db.metadata[it[1]].rubi
-            )
-        else:
-            rows.sort(reverse=self.__table_rev_sort)
+            self.table.set_filter(lambda song: song.id in matches)
+        self.refresh_lbl_selected()
 
-        for index, (values, item) in enumerate(rows):
-            self.treeview.move(item, "", index)
-            self.treeview.item(item, tags=("oddrow",) if index % 2 else ())
 
-        self.__table_cur_col_sort = col
+def _level_bounds(label: str) -> tuple[float, float]:
+    """Lowest and highest level shown as a label like 13 or 13+."""
+    level = int(label.rstrip("+"))
+    if label.endswith("+"):
+        return level + 0.01, level + 0.99
+    return level, level
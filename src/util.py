@@ -1,9 +1,12 @@
+from __future__ import annotations
+
 import os
-import re
 import shutil
 import sys
+from typing import TYPE_CHECKING
 
-from tkinter import Widget
+if TYPE_CHECKING:
+    from tkinter import Widget
 
 
 def resource_path(relative_path):
@@ -43,12 +46,9 @@ def ffmpeg_on_path() -> bool:
     return shutil.which("ffmpeg") != None
 
 
-def file_exists(path: str, regex: str) -> bool:
-    """Check if a file exists in a directory based on regex."""
-    for file in os.listdir(path):
-        if re.match(regex, file, re.IGNORECASE):
-            return True
-    return False
+def default_ffmpeg_jobs() -> int:
+    """Concurrent ffmpeg processes to run by default: half the cores."""
+    return max(1, (os.cpu_count() or 2) // 2)
 
 
 def disable_children_widgets(widget: Widget):
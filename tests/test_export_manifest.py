@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data.scan_index import fingerprint
+from export_manifest import ExportManifest, is_partial, partial_path
+
+
+def _write(path: str, data: bytes, mtime_ns: int = None):
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+class ExportManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src.wav")
+        self.out = os.path.join(self.tmp.name, "out")
+        self.dest = os.path.join(self.out, "Song", "1.wav")
+        _write(self.src, b"source", 1_000_000_000)
+        os.makedirs(os.path.dirname(self.dest))
+
+        self.manifest = ExportManifest(self.out)
+        src_fp = fingerprint(self.src)
+        _write(self.dest, b"output")
+        self.manifest.record(self.dest, self.src, src_fp, "copy")
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp.cleanup()
+
+    def test_skips_up_to_date_outputs(self):
+        self.assertTrue(self.manifest.is_done(self.dest, self.src, "copy"))
+
+    def test_kept_across_exports(self):
+        self.manifest.close()
+        self.manifest = ExportManifest(self.out)
+        self.assertTrue(self.manifest.is_done(self.dest, self.src, "copy"))
+
+    def test_redoes_outputs_with_other_params(self):
+        self.assertFalse(self.manifest.is_done(self.dest, self.src, ".mp3:320k"))
+
+    def test_redoes_outputs_of_changed_sources(self):
+        _write(self.src, b"changed source", 2_000_000_000)
+        self.assertFalse(self.manifest.is_done(self.dest, self.src, "copy"))
+
+    def test_redoes_changed_or_missing_outputs(self):
+        _write(self.dest, b"edited output")
+        self.assertFalse(self.manifest.is_done(self.dest, self.src, "copy"))
+        os.remove(self.dest)
+        self.assertFalse(self.manifest.is_done(self.dest, self.src, "copy"))
+
+    def test_deleted_sources_keep_outputs(self):
+        os.remove(self.src)
+        self.assertTrue(self.manifest.is_done(self.dest, self.src, "copy"))
+
+    def test_text_outputs_compare_hashes(self):
+        meta = os.path.join(self.out, "Song", "meta.mer")
+        _write(meta, b"#TITLE x\n")
+        self.manifest.record(meta, None, (None, None), "text", "abc")
+        self.assertTrue(self.manifest.is_done(meta, None, "text", "abc"))
+        self.assertFalse(self.manifest.is_done(meta, None, "text", "def"))
+
+    def test_partial_paths(self):
+        for name in ("1.wav", "meta.mer", "noext"):
+            with self.subTest(name=name):
+                partial = partial_path(os.path.join(self.out, name))
+                self.assertTrue(is_partial(os.path.basename(partial)))
+                self.assertFalse(is_partial(name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data.facets import FacetIndex
+from data.metadata import Difficulty, SongMetadata
+
+
+def _d(level: str, designer: str, video: str = None) -> Difficulty:
+    return Difficulty("", "", "", "", video, designer, "", level)
+
+
+def _song(id: str, genre: int, version: int, diffs: list) -> SongMetadata:
+    return SongMetadata(id, id, "", "", genre, "", "", version, diffs)
+
+
+SONGS = [
+    _song("S01-001", 0, 1, [_d("3", "x"), _d("7", "x"), _d("11.7", "y"), None]),
+    _song(
+        "S01-002",
+        1,
+        1,
+        [_d("2", "y", "v.mp4"), _d("6", "y"), _d("12", "z"), _d("13.5", "z")],
+    ),
+    _song("S01-003", 0, 2, [_d("4", "z"), _d("8", "x"), _d("12.7", "x"), None]),
+    _song("S01-004", 2, 3, [None, None, None, None]),
+]
+
+
+def _expected(song_filter) -> list[str]:
+    return [s.id for s in SONGS if song_filter(s)]
+
+
+def _levels(song: SongMetadata, difficulty: int = None) -> list[float]:
+    return [
+        float(d.diffLevel)
+        for i, d in enumerate(song.difficulties)
+        if d is not None and (difficulty is None or i == difficulty)
+    ]
+
+
+class FacetIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FacetIndex(SONGS)
+
+    def query(self, **kwargs) -> list[str]:
+        return self.index.song_ids(self.index.query(**kwargs))
+
+    def test_no_filters_match_every_song(self):
+        self.assertEqual(self.query(), [s.id for s in SONGS])
+
+    def test_intersections(self):
+        self.assertEqual(self.query(versions=[1], genres=[0]), ["S01-001"])
+        self.assertEqual(
+            self.query(versions=[1, 2], genres=[0]), ["S01-001", "S01-003"]
+        )
+        self.assertEqual(self.query(designers=["z"], video=True), ["S01-002"])
+        self.assertEqual(self.query(designers=["z"], video=False), ["S01-003"])
+        self.assertEqual(self.query(genres=[5]), [])
+        self.assertEqual(self.query(versions=[]), [])
+
+    def test_level_ranges(self):
+        for difficulty in (None, 0, 1, 2, 3):
+            for lo, hi in ((None, None), (12, None), (None, 4), (6, 8), (11.7, 12.7)):
+                if difficulty is None and lo is None and hi is None:
+                    continue  # no level filter at all
+                with self.subTest(difficulty=difficulty, min=lo, max=hi):
+                    self.assertEqual(
+                        self.query(difficulty=difficulty, min_level=lo, max_level=hi),
+                        _expected(
+                            lambda s: any(
+                                (lo is None or lo <= level)
+                                and (hi is None or level <= hi)
+                                for level in _levels(s, difficulty)
+                            )
+                        ),
+                    )
+
+    def test_levels_combined_with_facets(self):
+        self.assertEqual(
+            self.query(genres=[0], difficulty=2, min_level=12), ["S01-003"]
+        )
+        self.assertEqual(self.query(designers=["x"], min_level=12.5), ["S01-003"])
+
+    def test_levels(self):
+        self.assertEqual(self.index.levels(3), [13.5])
+        self.assertEqual(self.index.levels(), [2, 3, 4, 6, 7, 8, 11.7, 12, 12.7, 13.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
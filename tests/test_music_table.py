@@ -0,0 +1,41 @@
+import io
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data.music_table import _JsonReader
+
+DOCUMENTS = [
+    '{"A": 1.25, "Exports":[{"Table":{"Data":[1]}}]}',
+    '{"A": 1e-7, "Exports":[{"Table":{"Data":[1]}}]}',
+    '{"A": -12.5E+3 , "B": [1.5, {"c": "d\\"}"}], "Exports":'
+    ' [{"Table": {"Skip": 0.125, "Data": [{"x": 2.75}, 3e2, "s", true, null]}}]}',
+]
+
+
+def _rows(text: str) -> list:
+    reader = _JsonReader(io.StringIO(text))
+    reader.enter_key("Exports")
+    reader.enter_index(0)
+    reader.enter_key("Table")
+    reader.enter_key("Data")
+    return list(reader.iter_array())
+
+
+class JsonReaderTest(unittest.TestCase):
+    def test_matches_json_at_every_chunk_size(self):
+        for text in DOCUMENTS:
+            expected = json.loads(text)["Exports"][0]["Table"]["Data"]
+            for size in range(1, len(text) + 1):
+                with self.subTest(text=text, size=size), mock.patch.object(
+                    _JsonReader, "CHUNK_SIZE", size
+                ):
+                    self.assertEqual(_rows(text), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
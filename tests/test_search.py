@@ -0,0 +1,59 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data.metadata import SongMetadata
+from data.search import SearchIndex, normalize
+
+def _song(id: str, name: str, artist: str, rubi: str) -> SongMetadata:
+    return SongMetadata(id, name, artist, rubi, 0, "", "", 1)
+
+
+SONGS = [
+    _song("S01-001", "ＨＥＬＬＯ World", "Artist A", "はろーわーるど"),
+    _song("S01-002", "ハロー", "Artist B", "はろー"),
+    _song("S01-003", "Hello Again", "artist a", ""),
+    _song("S01-004", "Goodbye", "Someone", "ぐっばい"),
+]
+
+
+def _full_search(query: str) -> set[str]:
+    """Songs matching a query, checking every song."""
+    query = normalize(query)
+    return {
+        s.id
+        for s in SONGS
+        if any(query in normalize(f) for f in (s.name, s.artist, s.rubi) if f)
+    }
+
+
+class SearchIndexTest(unittest.TestCase):
+    def test_normalize_folds_width_case_kana_and_spaces(self):
+        self.assertEqual(normalize("ＨＥＬＬＯ World"), "helloworld")
+        self.assertEqual(normalize("ハロー"), "はろー")
+
+    def test_narrowing_agrees_with_full_search(self):
+        index = SearchIndex(SONGS)
+        for typed in ("hello world", "ハローわーるど", "artist a", "goodbye"):
+            for n in range(1, len(typed) + 1):
+                query = typed[:n]
+                with self.subTest(query=query):
+                    self.assertEqual(index.search(query), _full_search(query))
+
+    def test_backspacing_and_retyping(self):
+        index = SearchIndex(SONGS)
+        for query in ("hel", "hell", "hel", "he", "ha", "はろ", "h", "bye"):
+            with self.subTest(query=query):
+                self.assertEqual(index.search(query), _full_search(query))
+
+    def test_empty_query(self):
+        index = SearchIndex(SONGS)
+        index.search("hello")
+        self.assertIsNone(index.search("  "))
+        self.assertEqual(index.search("o"), _full_search("o"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from data.metadata import SongMetadata
+from ui.song_table import SongTable
+
+
+class _FakeTk:
+    def __init__(self, tree: "_FakeTreeview"):
+        self.tree = tree
+
+    def call(self, _widget, command, action, tag, items=None):
+        """ttk::treeview tag add/remove; like Tk 8.6, remove without items
+        only untags attached rows."""
+        assert command == "tag"
+        if items is None:
+            assert action == "remove"
+            items = self.tree.children
+        for id in items:
+            if action == "add":
+                self.tree.tags[id].add(tag)
+            else:
+                self.tree.tags[id].discard(tag)
+
+
+class _FakeTreeview:
+    """The parts of a Treeview SongTable uses, without a display."""
+
+    def __init__(self):
+        self.tk = _FakeTk(self)
+        self.tags: dict[str, set[str]] = dict()
+        self.children: list[str] = []
+
+    def insert(self, parent, index, iid, values, tags):
+        self.tags[iid] = set(tags)
+        self.children.append(iid)
+
+    def delete(self, *ids):
+        for id in ids:
+            del self.tags[id]
+        self.children = [id for id in self.children if id not in ids]
+
+    def set_children(self, parent, *ids):
+        self.children = list(ids)
+
+    def selection(self):
+        return ()
+
+    def selection_remove(self, *ids):
+        pass
+
+
+def _song(n: int) -> SongMetadata:
+    return SongMetadata(f"S01-{n:03}", f"Song {n}", "Artist", "", 0, "", "", 1)
+
+
+class SongTableStripeTest(unittest.TestCase):
+    def assertStriped(self, tree: _FakeTreeview, table: SongTable):
+        for i, id in enumerate(table.ids):
+            self.assertEqual("oddrow" in tree.tags[id], i % 2 == 1, id)
+        for id in set(tree.tags) - set(table.ids):
+            self.assertNotIn("oddrow", tree.tags[id], id)
+
+    def test_stripes_after_filter_unfilter_refilter(self):
+        tree = _FakeTreeview()
+        table = SongTable(tree, {"name": lambda s: s.name}, stripe_tag="oddrow")
+        table.load(_song(n) for n in range(10))
+        self.assertStriped(tree, table)
+
+        for filter in (
+            lambda s: s.id != "S01-001",
+            None,
+            lambda s: s.id not in ("S01-000", "S01-002"),
+            lambda s: int(s.id[-1]) % 3 != 0,
+            None,
+        ):
+            table.set_filter(filter)
+            self.assertStriped(tree, table)
+
+        table.sort("name", reverse=True)
+        self.assertStriped(tree, table)
+        table.add([_song(10), _song(11)])
+        self.assertStriped(tree, table)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import transfer
+
+DATA = bytes(range(256)) * 1000
+
+
+def _failing(err: int):
+    def fail(src: str, dest: str):
+        open(dest, "wb").close()  # like a strategy failing partway
+        raise OSError(err, os.strerror(err))
+
+    return fail
+
+
+class TransferTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src.wav")
+        self.dest = os.path.join(self.tmp.name, "dest.wav")
+        with open(self.src, "wb") as f:
+            f.write(DATA)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_dest(self) -> bytes:
+        with open(self.dest, "rb") as f:
+            return f.read()
+
+    def test_falls_back_when_unsupported(self):
+        for err in (errno.EOPNOTSUPP, errno.EXDEV):
+            with self.subTest(err=errno.errorcode[err]), mock.patch.dict(
+                transfer._TRANSFERS, {"reflink": _failing(err)}
+            ):
+                used = transfer.transfer(self.src, self.dest, ("reflink", "buffered"))
+                self.assertEqual(used, "buffered")
+                self.assertEqual(self.read_dest(), DATA)
+
+    def test_real_errors_are_raised(self):
+        with mock.patch.dict(
+            transfer._TRANSFERS, {"reflink": _failing(errno.ENOSPC)}
+        ), self.assertRaises(OSError) as cm:
+            transfer.transfer(self.src, self.dest, ("reflink", "buffered"))
+        self.assertEqual(cm.exception.errno, errno.ENOSPC)
+
+    def test_last_unsupported_error_is_raised(self):
+        with mock.patch.dict(
+            transfer._TRANSFERS, {"reflink": _failing(errno.EXDEV)}
+        ), self.assertRaises(OSError) as cm:
+            transfer.transfer(self.src, self.dest, ("reflink",))
+        self.assertEqual(cm.exception.errno, errno.EXDEV)
+
+    def test_kernel_copy_copying_nothing_falls_back(self):
+        nothing = transfer._kernel_copy(lambda src_fd, dest_fd, offset, count: 0)
+        with mock.patch.dict(transfer._TRANSFERS, {"sendfile": nothing}):
+            used = transfer.transfer(self.src, self.dest, ("sendfile", "buffered"))
+        self.assertEqual(used, "buffered")
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_every_strategy_copies(self):
+        for name in transfer.STRATEGIES:
+            with self.subTest(name=name):
+                try:
+                    used = transfer.transfer(self.src, self.dest, (name,))
+                except (OSError, ValueError):
+                    continue  # not supported here
+                self.assertEqual(used, name)
+                self.assertEqual(self.read_dest(), DATA)
+
+    def test_default_makes_independent_copies(self):
+        transfer.transfer(self.src, self.dest)
+        self.assertEqual(os.stat(self.dest).st_nlink, 1)
+        self.assertEqual(self.read_dest(), DATA)
+
+    def test_move_renames(self):
+        self.assertEqual(transfer.transfer(self.src, self.dest, move=True), "rename")
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read_dest(), DATA)
+
+
+if __name__ == "__main__":
+    unittest.main()